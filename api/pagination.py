@@ -1,36 +1,131 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from django.core.cache import cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Count strategies, used to fill in `total_records` and `total_pages`
+
+class ExactCount:
+    """Runs a COUNT(*) on every request."""
+
+    def get_count(self, queryset, request, view):
+        return queryset.count()
+
+
+class CachedCount(ExactCount):
+    """Caches the exact count per (user, project) for `timeout` seconds."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+
+    def get_cache_key(self, request, view):
+        project_id = view.kwargs.get('project_id', '') if view else ''
+        return f'pagination_count_{view.__class__.__name__}_{request.user.pk}_{project_id}'
+
+    def get_count(self, queryset, request, view):
+        key = self.get_cache_key(request, view)
+        count = cache.get(key)
+
+        if count is None:
+            count = super().get_count(queryset, request, view)
+            cache.set(key, count, timeout=self.timeout)
+
+        return count
+
+
+class DenormalizedCount(ExactCount):
+    """
+    Reads a counter the view already maintains through `get_total_count()`.
+    Falls back to an exact count for views without one.
+    """
+
+    def get_count(self, queryset, request, view):
+        if hasattr(view, 'get_total_count'):
+            return view.get_total_count()
+        return super().get_count(queryset, request, view)
+
+
+class CountStrategyPaginator(DjangoPaginator):
+    def __init__(self, object_list, per_page, count_function=None, **kwargs):
+        self.count_function = count_function
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_function is not None:
+            return self.count_function()
+        return super().count
+
 
 class CustomPagination(pagination.PageNumberPagination):
-    """Custom pagination."""
+    """
+    Custom pagination.
+
+    Pages are numbered by default. Passing `?paginate=cursor` (or a `cursor` returned by
+    a previous page) switches to keyset pagination over `cursor_ordering`, which skips the
+    COUNT(*) and OFFSET scan so deep pages cost the same as the first one.
+    """
 
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 50
 
+    results_key = 'results'
 
-# PROJECTS
+    cursor_query_param = 'cursor'
+    mode_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
 
-class ProjectsPagination(CustomPagination):    
-    def get_paginated_response(self, data):
-        current_page = self.page.number
-        total_pages = self.page.paginator.num_pages
+    # (field, tie-breaker) both ordered descending, e.g. ('created_at', 'id')
+    cursor_ordering = None
 
-        return Response(
-            {
-                'current_page': current_page,
-                'total_pages': total_pages,
-                'total_records': self.page.paginator.count,
-                'next': self.get_next_link(),
-                'previous': self.get_previous_link(),
-                'projects': data,
-            }
+    count_strategy = ExactCount()
+
+    def django_paginator_class(self, queryset, page_size):
+        # DRF instantiates the paginator through this attribute, so a method lets us
+        # hand the count strategy to it.
+        return CountStrategyPaginator(
+            queryset,
+            page_size,
+            count_function=lambda: self.count_strategy.get_count(queryset, self.request, self.view),
         )
 
-# PROJECTS
+    def wants_cursor(self, request):
+        return bool(self.cursor_ordering) and (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.use_cursor = self.wants_cursor(request)
+
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        return self.paginate_queryset_by_cursor(queryset, request)
 
-class CommentsPagination(CustomPagination):    
     def get_paginated_response(self, data):
+        if self.use_cursor:
+            return Response(
+                {
+                    'page_size': self.cursor_page_size,
+                    'next': self.get_next_cursor_link(),
+                    'previous': self.get_previous_cursor_link(),
+                    self.results_key: data,
+                }
+            )
+
         current_page = self.page.number
         total_pages = self.page.paginator.num_pages
 
@@ -41,8 +136,111 @@ class CommentsPagination(CustomPagination):
                 'total_records': self.page.paginator.count,
                 'next': self.get_next_link(),
                 'previous': self.get_previous_link(),
-                'comments': data,
+                self.results_key: data,
             }
         )
 
+    # Keyset pagination
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        field, tie_breaker = self.cursor_ordering
+        self.cursor_page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            reverse = False
+        else:
+            (value, key), reverse = cursor
+            if reverse:
+                # Walking back towards newer rows
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, f'{tie_breaker}__gt': key})
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, f'{tie_breaker}__lt': key})
+                )
+
+        if reverse:
+            queryset = queryset.order_by(field, tie_breaker)
+        else:
+            queryset = queryset.order_by(f'-{field}', f'-{tie_breaker}')
+
+        # Fetch one extra row to find out if there is another page
+        results = list(queryset[:self.cursor_page_size + 1])
+        has_more = len(results) > self.cursor_page_size
+        results = results[:self.cursor_page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page_results = results
+        return results
+
+    def get_next_cursor_link(self):
+        if not self.has_next or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[-1], reverse=False)
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous or not self.page_results:
+            return None
+        return self.encode_cursor(self.page_results[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        field, tie_breaker = self.cursor_ordering
+        value = getattr(obj, field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+
+        payload = json.dumps({'p': [value, getattr(obj, tie_breaker)], 'r': int(reverse)})
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            value, key = payload['p']
+            reverse = bool(payload['r'])
+            key = int(key)
+
+            # Cursors are only issued for datetime orderings
+            if not isinstance(value, str):
+                raise ValueError(value)
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError(payload['p'][0])
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return (value, key), reverse
+
+
+# PROJECTS
+
+class ProjectsPagination(CustomPagination):
+    results_key = 'projects'
+    cursor_ordering = ('updated_at', 'id')
+
+    # The view counts the user's projects from their cached role map
+    count_strategy = DenormalizedCount()
+
+# COMMENTS
+
+class CommentsPagination(CustomPagination):
+    results_key = 'comments'
+    cursor_ordering = ('created_at', 'id')
 
+    # The view reads Project.comment_count
+    count_strategy = DenormalizedCount()
@@ -1,4 +1,8 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
+from api.utils.eager_loading import EagerLoadingMixin
+from apps.project.counters import update_project_counters
 from apps.project.models import Comment, Document, Project, ProjectRole
 from api.serializers.user import SimplifiedUserSerializer, UserSerializer
 
@@ -12,12 +16,30 @@ class ProjectRoleSerializer(serializers.ModelSerializer):
         fields = ('id', 'role', 'user', 'user_id',)
         read_only_fields = ('project',)
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectMemberItemSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    role = serializers.ChoiceField(choices=ProjectRole.ROLE_CHOICES)
+
+class ProjectMembersSerializer(serializers.Serializer):
+    # Items are validated one by one by the view, so that one bad item doesn't reject the batch
+    members = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+class ProjectSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     member_roles = ProjectRoleSerializer(source='projectrole', many=True, read_only=True)
 
+    # Members and their users are rendered for every project
+    prefetch_related_fields = (
+        Prefetch('projectrole', queryset=ProjectRole.objects.select_related('user')),
+    )
+
     class Meta:
         model = Project
-        fields = ('id', 'title', 'description', 'created_at', 'updated_at', 'member_roles')
+        fields = (
+            'id', 'title', 'description', 'created_at', 'updated_at',
+            'comment_count', 'document_count', 'member_count', 'last_activity_at',
+            'member_roles',
+        )
+        read_only_fields = ('comment_count', 'document_count', 'member_count', 'last_activity_at')
 
 class ProjectUpdateSerializer(serializers.ModelSerializer):    
     class Meta:
@@ -55,16 +77,23 @@ class DocumentSerializer(serializers.ModelSerializer):
 
         return value
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = SimplifiedUserSerializer(read_only=True)
     documents = DocumentSerializer(many=True, read_only=True)
 
+    select_related_fields = ('user',)
+    prefetch_related_fields = ('documents',)
+
     class Meta:
         model = Comment
         fields = ('id', 'project', 'user', 'content', 'created_at', 'documents')
         read_only_fields = ('user',)
 
-class CommentCreateSerializer(serializers.ModelSerializer):
+class CommentImportSerializer(serializers.Serializer):
+    # Imported comments are always authored by the importing user
+    content = serializers.CharField()
+
+class CommentCreateSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(
             default=serializers.CurrentUserDefault()
         )
@@ -75,6 +104,8 @@ class CommentCreateSerializer(serializers.ModelSerializer):
     )
     documents = DocumentSerializer(many=True, read_only=True)
 
+    prefetch_related_fields = ('documents',)
+
     class Meta:
         model = Comment
         fields = ('id', 'project', 'user', 'content', 'documents', 'files')
@@ -112,10 +143,16 @@ class CommentCreateSerializer(serializers.ModelSerializer):
 
         # return super().create(validated_data)
         files_data = validated_data.pop("files", [])
-        comment = Comment.objects.create(**validated_data)
 
-        # Save multiple files
-        for file_data in files_data:
-            Document.objects.create(comment=comment, user=request.user, file=file_data)
+        with transaction.atomic():
+            comment = Comment.objects.create(**validated_data)
+
+            # Save multiple files in a single insert
+            Document.objects.bulk_create([
+                Document(comment=comment, user=request.user, file=file_data)
+                for file_data in files_data
+            ])
+
+            update_project_counters(comment.project_id, comment_count=1, document_count=len(files_data))
 
         return comment
@@ -1,10 +1,14 @@
-from django.utils import timezone
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from django.contrib.auth import password_validation
 from rest_framework_simplejwt.tokens import RefreshToken
 from apps.user.models import User
+from apps.user.activity import record_login
+from apps.user.authentication import TOKEN_USER_CLAIMS, add_user_claims
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.serializers import PasswordField, TokenObtainPairSerializer
 
 
@@ -89,36 +93,28 @@ class UserLoginSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
 
         # Add custom claims to the token
-        token['username'] = user.username
-        token['email'] = user.email
-        return token
+        return add_user_claims(token, user)
 
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
     def validate(self, attrs):
         # Standard refresh validation
         data = super().validate(attrs)
-        # Extract the refresh token to get embedded claims
         refresh = RefreshToken(attrs['refresh'])
-        
-        # Update last_login for user
-        try:
-            user_id = refresh.payload.get('user_id')
-            user = User.objects.filter(id=user_id).first()
-            if user:
-                user.last_login = timezone.now()
-                user.save(update_fields=['last_login'])
-        except Exception as e:
-            # Log error if needed but don't interrupt the refresh process
-            pass
-
-        # Copy claims from refresh token to the new access token
-        access_token = refresh.access_token
-        access_token['username'] = refresh['username']
-        access_token['email'] = refresh['email']
-        access_token['email_verified'] = refresh['email_verified']
-
-        # Return the new access token with claims
-        data['access'] = str(access_token)
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+
+        # Read the claims again instead of copying the refresh token's, which may be up
+        # to a day old and miss a username, email or verification change
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).only(*TOKEN_USER_CLAIMS).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # Update last_login for user, coalesced with other logins and written in batches
+        record_login(user_id)
+
+        # Return the new access token with up to date claims
+        data['access'] = str(add_user_claims(refresh.access_token, user))
         return data
 
 class UserRegisterSerializer(serializers.ModelSerializer):
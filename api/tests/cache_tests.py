@@ -0,0 +1,83 @@
+import uuid
+from django.core.cache import cache
+from pma.backends.cache import EPOCH_KEY, TieredCache
+
+
+class TestTieredCache:
+
+    def make_worker(self, name, **options):
+        # Each location gets its own L1, like separate worker processes sharing one backend
+        options = {
+            "SHARED": "default",
+            "EPOCH_POLL_INTERVAL": 0,
+            "L1_KEY_PREFIXES": ["hot_"],
+            "BROADCAST_KEY_PREFIXES": ["hot_version_"],
+            **options,
+        }
+        return TieredCache(f"{name}-{uuid.uuid4()}", {"OPTIONS": options})
+
+    def test_reads_are_served_from_l1(self):
+        worker = self.make_worker("worker")
+        cache.set("hot_key", "old")
+
+        assert worker.get("hot_key") == "old"
+
+        # Written behind the tier's back, so nothing invalidates the L1 copy
+        cache.set("hot_key", "new")
+        assert worker.get("hot_key") == "old"
+
+    def test_version_writes_invalidate_other_workers(self):
+        first, second = self.make_worker("first"), self.make_worker("second")
+        first.set("hot_version_1", "old")
+        assert second.get("hot_version_1") == "old"
+
+        first.set("hot_version_1", "new")
+        assert second.get("hot_version_1") == "new"
+
+        first.set_many({"hot_version_1": "newer"})
+        assert second.get("hot_version_1") == "newer"
+
+        first.delete("hot_version_1")
+        assert second.get("hot_version_1") is None
+        assert second.get_many(["hot_version_1"]) == {}
+
+    def test_versioned_writes_dont_broadcast(self):
+        first, second = self.make_worker("first"), self.make_worker("second")
+        first.set("hot_version_1", 1)
+        epoch = cache.get(EPOCH_KEY)
+        assert second.get("hot_version_1") == 1
+
+        # Filling a new versioned key, or creating a version, leaves the other L1s alone
+        first.set("hot_1_v1", {"roles": 1})
+        assert first.add("hot_version_2", 1)
+        assert not first.add("hot_version_2", 2)
+
+        assert cache.get(EPOCH_KEY) == epoch
+        assert [key for key, _ in second._tier.entries] == ["hot_version_1"]
+        assert first.get("hot_version_2") == 1
+        assert second.get("hot_1_v1") == {"roles": 1}
+
+    def test_other_keys_bypass_l1(self):
+        first, second = self.make_worker("first"), self.make_worker("second")
+        first.set("hot_key", "old")
+        epoch = cache.get(EPOCH_KEY)
+        assert second.get("hot_key") == "old"
+
+        second.set("cold_key", 1)
+        second.add("cold_lock", True)
+        second.delete("cold_lock")
+        assert second.get_many(["hot_key", "cold_key"]) == {"hot_key": "old", "cold_key": 1}
+
+        # Writes to other keys neither broadcast nor clear anyone's L1
+        assert cache.get(EPOCH_KEY) == epoch
+        assert [key for key, _ in second._tier.entries] == ["hot_key"]
+
+        cache.set("cold_key", 2)
+        assert second.get("cold_key") == 2
+
+    def test_l1_is_bounded(self):
+        worker = self.make_worker("worker", L1_MAX_ENTRIES=2)
+        worker.set_many({"hot_a": 1, "hot_b": 2, "hot_c": 3})
+
+        assert len(worker._tier.entries) == 2
+        assert worker.get_many(["hot_a", "hot_b", "hot_c"]) == {"hot_a": 1, "hot_b": 2, "hot_c": 3}
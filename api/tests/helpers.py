@@ -0,0 +1,37 @@
+import re
+from django.db import connection
+
+
+def explain(queryset):
+    """
+    Returns the query plan of a queryset. On PostgreSQL sequential scans are disabled
+    for the duration of the transaction, so tiny test tables report the plan a large table would get.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    return queryset.explain()
+
+
+def assert_uses_index(queryset, index_name=None):
+    """
+    Asserts that the queryset is answered through an index (the given one, if any)
+    rather than a full table scan.
+    """
+    plan = explain(queryset)
+
+    if index_name:
+        assert index_name in plan, f"Expected the plan to use {index_name}:\n{plan}"
+
+    if connection.vendor == 'postgresql':
+        assert 'Seq Scan' not in plan, f"Expected no sequential scan:\n{plan}"
+    else:
+        # SQLite reports full scans as "SCAN <table>" without a "USING ... INDEX" clause
+        full_scans = [
+            line for line in plan.splitlines()
+            if re.search(r'\bSCAN\b', line) and 'INDEX' not in line
+        ]
+        assert not full_scans, f"Expected no full table scan:\n{plan}"
+
+    return plan
@@ -1,8 +1,31 @@
+import csv
+import json
+import base64
 import pytest
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from api.pagination import CachedCount, CommentsPagination
+from api.tests.helpers import assert_uses_index
+from api.views.project import CommentExportAPIView, CommentImportAPIView, ProjectCreateAPIView, ProjectListAPIView, ProjectMembersAPIView
+from pma.routers import ReplicaRouter, ReplicaRoutingMiddleware
+from apps.project.counters import recompute_project_counters
 from apps.project.models import Document, Project, ProjectRole, Comment
+from apps.user.models import User
+
+
+ROLE_MAP_SQL = 'SELECT "project_projectrole"."project_id", "project_projectrole"."role"'
+
+def role_map_queries(ctx):
+    return [q for q in ctx.captured_queries if q["sql"].startswith(ROLE_MAP_SQL)]
 
 
 @pytest.mark.django_db
@@ -18,6 +41,36 @@ class TestProjectAPI:
         assert response.data["total_records"] == 1
         assert response.data["projects"][0]["title"] == project.title
 
+    def test_list_projects_query_count_is_constant(self, authenticated_project_owner, create_project, create_user):
+        client, owner, _ = authenticated_project_owner
+        for i in range(6):
+            project, _ = create_project(owner=owner, title=f"Project {i}")
+            for _ in range(3):
+                ProjectRole.objects.create(user=create_user(), project=project, role="READER")
+        url = reverse("project-list")
+        client.get(url)  # Warm the role cache so both runs below hit it
+
+        query_counts = []
+        for page_size in (2, 7):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, {"page_size": page_size})
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["projects"]) == page_size
+            assert all(len(p["member_roles"]) == 4 for p in response.data["projects"][:-1])
+            query_counts.append(len(ctx.captured_queries))
+
+        assert query_counts[0] == query_counts[1]
+
+    def test_list_projects_counts_from_role_map(self, authenticated_project_owner, create_project):
+        client, owner, _ = authenticated_project_owner
+        create_project(owner=owner, title="Second Project")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse("project-list"))
+
+        assert response.data["total_records"] == 2
+        assert not any("COUNT(*)" in q["sql"] for q in ctx.captured_queries)
+
     def test_create_project(self, authenticated_client):
         client, _ = authenticated_client
         url = reverse("project-create")
@@ -85,6 +138,37 @@ class TestProjectMemberAPI:
         project_role = ProjectRole.objects.get(user=new_user, project=project)
         assert project_role.role == "OWNER"
 
+    def test_add_member_loads_roles_once(self, authenticated_project_owner, create_user):
+        client, _, project = authenticated_project_owner
+        new_user = create_user()
+        url = reverse("add-member", kwargs={"id": project.id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(url, {"user_id": new_user.id, "role": "EDITOR"})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(role_map_queries(ctx)) == 1
+
+    def test_cached_roles_invalidated_when_member_added(self, authenticated_project_owner, create_user, api_client):
+        client, _, project = authenticated_project_owner
+        new_user = create_user()
+        member_client = api_client.__class__()
+        member_client.force_authenticate(user=new_user)
+        detail_url = reverse("project-detail", kwargs={"id": project.id})
+
+        # Caches an empty role map for the new user
+        assert member_client.get(detail_url).status_code == status.HTTP_403_FORBIDDEN
+
+        response = client.post(reverse("add-member", kwargs={"id": project.id}), {"user_id": new_user.id, "role": "READER"})
+        assert response.status_code == status.HTTP_201_CREATED
+
+        assert member_client.get(detail_url).status_code == status.HTTP_200_OK
+
+        # Served from the cache, no role queries needed
+        with CaptureQueriesContext(connection) as ctx:
+            assert member_client.get(detail_url).status_code == status.HTTP_200_OK
+        assert role_map_queries(ctx) == []
+
     def test_add_member_invalid_role(self, authenticated_project_owner, create_user):
         client, _, project = authenticated_project_owner
         new_user = create_user()
@@ -160,6 +244,92 @@ class TestProjectMemberAPI:
         assert response.status_code == status.HTTP_403_FORBIDDEN
         assert response.data["detail"] == "Only owners can update member roles"
 
+    def test_bulk_members(self, authenticated_project_owner, create_user):
+        client, _, project = authenticated_project_owner
+        new_user, member, unchanged = create_user(), create_user(), create_user()
+        ProjectRole.objects.create(user=member, project=project, role="READER")
+        ProjectRole.objects.create(user=unchanged, project=project, role="READER")
+        project.member_count = 3
+        project.save()
+
+        payload = {"members": [
+            {"user_id": new_user.id, "role": "EDITOR"},
+            {"user_id": member.id, "role": "EDITOR"},
+            {"user_id": unchanged.id, "role": "READER"},
+            {"user_id": 9999, "role": "EDITOR"},
+            {"user_id": new_user.id, "role": "INVALID_ROLE"},
+        ]}
+        response = client.post(reverse("project-members", kwargs={"id": project.id}), payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert (response.data["created"], response.data["updated"]) == (1, 1)
+        assert [r["status"] for r in response.data["results"]] == ["created", "updated", "unchanged", "user_not_found", "invalid"]
+        assert ProjectRole.objects.get(user=new_user, project=project).role == "EDITOR"
+        assert ProjectRole.objects.get(user=member, project=project).role == "EDITOR"
+        project.refresh_from_db()
+        assert project.member_count == 4
+
+    def test_bulk_members_concurrent_add_is_a_conflict(self, authenticated_project_owner, create_user):
+        client, _, project = authenticated_project_owner
+        racer, new_user = create_user(), create_user()
+        create_roles = ProjectMembersAPIView.create_roles
+
+        def add_concurrently(view, roles, requested):
+            # Another request adds the same member after this one read the existing roles
+            ProjectRole.objects.bulk_create([ProjectRole(user=racer, project=project, role="READER")])
+            return create_roles(view, roles, requested)
+
+        payload = {"members": [{"user_id": racer.id, "role": "EDITOR"}, {"user_id": new_user.id, "role": "EDITOR"}]}
+        with patch.object(ProjectMembersAPIView, "create_roles", autospec=True, side_effect=add_concurrently):
+            response = client.post(reverse("project-members", kwargs={"id": project.id}), payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["created"] == 1
+        assert [r["status"] for r in response.data["results"]] == ["conflict", "created"]
+        assert ProjectRole.objects.get(user=racer, project=project).role == "READER"
+        # Only the member this request created is counted
+        assert Project.objects.get(id=project.id).member_count == project.member_count + 1
+
+    def test_bulk_members_query_count_is_constant(self, authenticated_project_owner, create_user):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-members", kwargs={"id": project.id})
+
+        def add(count):
+            members = [{"user_id": create_user().id, "role": "READER"} for _ in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.post(url, {"members": members}, format="json")
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data["created"] == count
+            return len(ctx.captured_queries)
+
+        add(1)  # Warms the owner's role cache
+        assert add(2) == add(20)
+
+    def test_bulk_members_invalidates_cached_roles(self, authenticated_project_owner, create_user, api_client):
+        client, _, project = authenticated_project_owner
+        new_user = create_user()
+        member_client = api_client.__class__()
+        member_client.force_authenticate(user=new_user)
+        detail_url = reverse("project-detail", kwargs={"id": project.id})
+
+        # Caches an empty role map for the new user
+        assert member_client.get(detail_url).status_code == status.HTTP_403_FORBIDDEN
+
+        payload = {"members": [{"user_id": new_user.id, "role": "READER"}]}
+        client.post(reverse("project-members", kwargs={"id": project.id}), payload, format="json")
+
+        assert member_client.get(detail_url).status_code == status.HTTP_200_OK
+
+    def test_bulk_members_not_owner(self, authenticated_client, create_project, create_user):
+        client, _ = authenticated_client
+        project, _ = create_project()
+
+        payload = {"members": [{"user_id": create_user().id, "role": "EDITOR"}]}
+        response = client.post(reverse("project-members", kwargs={"id": project.id}), payload, format="json")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not ProjectRole.objects.filter(project=project, role="EDITOR").exists()
+
 
 
 @pytest.mark.django_db
@@ -174,6 +344,108 @@ class TestProjectCommentsAPI:
         assert len(response.data["comments"]) == 0
         assert response.data["total_records"] == 0
 
+    def test_list_comments_query_count_is_constant(self, authenticated_project_owner, create_user):
+        client, owner, project = authenticated_project_owner
+        for i in range(8):
+            author = create_user()
+            ProjectRole.objects.create(user=author, project=project, role="EDITOR")
+            comment = Comment.objects.create(project=project, user=author, content=f"Comment {i}")
+            Document.objects.create(comment=comment, user=author, file=f"comments/doc-{i}.pdf")
+        recompute_project_counters()
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+        client.get(url)  # Warm the role cache so both runs below hit it
+
+        query_counts = []
+        for page_size in (2, 8):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, {"page_size": page_size})
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data["comments"]) == page_size
+            assert all(len(c["documents"]) == 1 for c in response.data["comments"])
+            query_counts.append(len(ctx.captured_queries))
+
+        assert query_counts[0] == query_counts[1]
+
+    def test_list_comments_cursor_pagination(self, authenticated_project_owner):
+        client, owner, project = authenticated_project_owner
+        comments = [Comment.objects.create(project=project, user=owner, content=f"Comment {i}") for i in range(5)]
+        expected_ids = [c.id for c in reversed(comments)]
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+
+        response = client.get(url, {"paginate": "cursor", "page_size": 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert "total_records" not in response.data
+        assert response.data["previous"] is None
+
+        seen_ids, pages = [], []
+        while True:
+            pages.append(response.data)
+            seen_ids += [c["id"] for c in response.data["comments"]]
+            if not response.data["next"]:
+                break
+            response = client.get(response.data["next"])
+        assert seen_ids == expected_ids
+
+        # Walk back from the last page
+        response = client.get(pages[-1]["previous"])
+        assert [c["id"] for c in response.data["comments"]] == expected_ids[2:4]
+
+    def test_list_comments_count_is_denormalized(self, authenticated_project_owner):
+        client, owner, project = authenticated_project_owner
+        client.post(reverse("comment-create"), {"project": project.id, "content": "First"})
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        assert response.data["total_records"] == 1
+        assert not any("COUNT(*)" in q["sql"] for q in ctx.captured_queries)
+
+    def test_list_comments_cached_count(self, authenticated_project_owner):
+        client, owner, project = authenticated_project_owner
+        Comment.objects.create(project=project, user=owner, content="First")
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+
+        with patch.object(CommentsPagination, "count_strategy", CachedCount(timeout=30)):
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            assert response.data["total_records"] == 1
+            assert any("COUNT(*)" in q["sql"] for q in ctx.captured_queries)
+
+            # Served from the cache until the timeout, even if stale
+            Comment.objects.create(project=project, user=owner, content="Second")
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url)
+            assert response.data["total_records"] == 1
+            assert not any("COUNT(*)" in q["sql"] for q in ctx.captured_queries)
+
+            cache.delete(f"pagination_count_CommentListAPIView_{owner.pk}_{project.id}")
+            response = client.get(url)
+            assert response.data["total_records"] == 2
+
+    def test_list_comments_invalid_cursor(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+
+        response = client.get(url, {"cursor": "not-a-cursor"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize("position", [
+        "abc",
+        "2024-13-45T00:00:00",
+        None,
+        ["2024-01-01T00:00:00"],
+        7,
+    ])
+    def test_list_comments_tampered_cursor(self, authenticated_project_owner, position):
+        client, owner, project = authenticated_project_owner
+        Comment.objects.create(project=project, user=owner, content="Hello")
+        cursor = base64.urlsafe_b64encode(json.dumps({"p": [position, 1], "r": 0}).encode()).decode()
+
+        for url in (reverse("comment-list", kwargs={"project_id": project.id}), reverse("project-list")):
+            response = client.get(url, {"cursor": cursor})
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+            assert response.data["detail"] == "Invalid cursor"
+
     def test_create_comment(self, authenticated_project_owner):
         client, _, project = authenticated_project_owner
         url = reverse("comment-create")
@@ -288,6 +560,398 @@ class TestProjectCommentsAPI:
         response_both = client.post(url, payload_both, format='multipart')
         assert response_both.status_code == status.HTTP_201_CREATED
 
+    def test_import_comments_json(self, authenticated_client, create_project):
+        client, editor = authenticated_client
+        project, owner = create_project()
+        ProjectRole.objects.create(user=editor, project=project, role="EDITOR")
+        url = reverse("comment-import", kwargs={"project_id": project.id})
+
+        payload = [
+            {"content": "From the editor"},
+            {"content": "Posing as the owner", "user_id": owner.id},
+            {"content": ""},
+        ]
+        response = client.post(url, payload, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        results = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        assert [(r["index"], r["status"]) for r in sorted(results, key=lambda r: r["index"])] == [
+            (0, "created"), (1, "created"), (2, "invalid"),
+        ]
+        # Every comment is authored by the importing user
+        assert set(Comment.objects.filter(project=project).values_list("user_id", flat=True)) == {editor.id}
+        project.refresh_from_db()
+        assert project.comment_count == 2
+
+    def test_import_comments_ndjson_in_chunks(self, authenticated_project_owner, monkeypatch):
+        client, _, project = authenticated_project_owner
+        monkeypatch.setattr(CommentImportAPIView, "chunk_size", 2)
+        url = reverse("comment-import", kwargs={"project_id": project.id})
+        body = "\n".join([json.dumps({"content": f"Comment {i}"}) for i in range(5)] + ["not json"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(url, body, content_type="application/x-ndjson")
+            results = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        statuses = {r["index"]: r["status"] for r in results}
+        assert statuses == {0: "created", 1: "created", 2: "created", 3: "created", 4: "created", 5: "invalid"}
+        assert len([q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "project_comment"')]) == 3
+        assert Comment.objects.filter(project=project).count() == 5
+
+    def test_export_comments_ndjson(self, authenticated_project_owner, monkeypatch):
+        client, owner, project = authenticated_project_owner
+        monkeypatch.setattr(CommentExportAPIView, "chunk_size", 2)
+        comments = [Comment.objects.create(project=project, user=owner, content=f"Comment {i}") for i in range(5)]
+        Document.objects.create(comment=comments[0], user=owner, file="comment_documents/report.pdf")
+        url = reverse("comment-export", kwargs={"project_id": project.id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+            rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["id"] for row in rows] == [comment.id for comment in comments]
+        assert rows[0]["documents"] == ["comment_documents/report.pdf"]
+        assert rows[0]["username"] == owner.username
+        # Comments come from a single cursor, documents are fetched once per chunk of 2
+        assert len([q for q in ctx.captured_queries if 'FROM "project_comment"' in q["sql"]]) == 1
+        assert len([q for q in ctx.captured_queries if 'FROM "project_document"' in q["sql"]]) == 3
+
+    def test_export_comments_csv(self, authenticated_project_owner):
+        client, owner, project = authenticated_project_owner
+        Comment.objects.create(project=project, user=owner, content="Hello, world")
+
+        response = client.get(reverse("comment-export", kwargs={"project_id": project.id}), {"export_format": "csv"})
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        assert rows[0] == ["id", "created_at", "user_id", "username", "email", "content", "documents"]
+        assert rows[1][5] == "Hello, world"
+
+    def test_export_comments_not_member(self, authenticated_client, create_project):
+        client, _ = authenticated_client
+        project, _ = create_project()
+
+        response = client.get(reverse("comment-export", kwargs={"project_id": project.id}))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_import_comments_reader_forbidden(self, authenticated_client, create_project):
+        client, user = authenticated_client
+        project, _ = create_project()
+        ProjectRole.objects.create(user=user, project=project, role="READER")
+
+        response = client.post(reverse("comment-import", kwargs={"project_id": project.id}), [{"content": "Hi"}], format="json")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not Comment.objects.filter(project=project).exists()
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def test_project_detail_not_modified(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        etag = client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+        # Only the validators were read, nothing was loaded for serialization
+        assert not [q for q in ctx.captured_queries if "project_projectrole" in q["sql"]]
+
+    def test_project_detail_changes_with_members(self, authenticated_project_owner, create_user):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        etag = client.get(url)["ETag"]
+
+        member = create_user()
+        ProjectRole.objects.create(user=member, project=project, role="READER")
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        etag = response["ETag"]
+
+        member.bio = "Changed"
+        member.save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+    def test_comment_list_not_modified(self, authenticated_project_owner):
+        client, owner, project = authenticated_project_owner
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+        etag = client.get(url)["ETag"]
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+        # Another page is another representation
+        assert client.get(url, {"page_size": 10}, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+        response = client.post(reverse("comment-create"), {"project": project.id, "content": "New"})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestProjectPayloadCache:
+
+    def test_payload_is_cached_until_the_project_changes(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert client.get(url).status_code == status.HTTP_200_OK
+        # Just the validators query, no members or users loaded
+        project_queries = [q for q in ctx.captured_queries if "project_" in q["sql"]]
+        assert len(project_queries) == 1
+        assert "project_projectrole" not in project_queries[0]["sql"]
+
+        response = client.patch(reverse("project-update", kwargs={"id": project.id}), {"title": "Renamed"})
+        assert response.status_code == status.HTTP_200_OK
+        assert client.get(url).data["title"] == "Renamed"
+
+    def test_counter_updates_invalidate_payload(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        client.get(url)
+
+        client.post(reverse("comment-create"), {"project": project.id, "content": "New"})
+
+        assert client.get(url).data["comment_count"] == 1
+
+    def test_payload_rebuilt_when_the_version_goes_back(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        client.get(url)
+        version = cache.get(f"project_version_{project.id}")
+
+        # Bumped by a host whose clock is behind
+        Project.objects.filter(id=project.id).update(title="Renamed")
+        cache.set(f"project_version_{project.id}", version - 10**9, timeout=None)
+
+        assert client.get(url).data["title"] == "Renamed"
+
+    def test_stale_payload_served_while_refilling(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-detail", kwargs={"id": project.id})
+        client.get(url)
+
+        # Another request is rebuilding the payload
+        cache.add(f"project_payload_{project.id}_refill", True)
+        project.title = "Renamed"
+        project.save()
+        response = client.get(url)
+        assert response.data["title"] == "Test Project"
+        # The stale copy gets no validators, so the client can't revalidate its way onto it
+        assert "ETag" not in response and "Last-Modified" not in response
+
+        cache.delete(f"project_payload_{project.id}_refill")
+        response = client.get(url)
+        assert response.data["title"] == "Renamed"
+        assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_missing_payload_built_after_waiting(self, authenticated_project_owner, monkeypatch):
+        client, _, project = authenticated_project_owner
+        monkeypatch.setattr("apps.project.cache.PROJECT_PAYLOAD_REFILL_WAIT", 0)
+        cache.add(f"project_payload_{project.id}_refill", True)
+
+        response = client.get(reverse("project-detail", kwargs={"id": project.id}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["title"] == "Test Project"
+
+
+@pytest.mark.django_db
+class TestProjectListCache:
+
+    def test_list_served_from_cache(self, authenticated_project_owner, create_project):
+        client, owner, _ = authenticated_project_owner
+        create_project(owner=owner, title="Second Project")
+        url = reverse("project-list")
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+
+        assert [p["title"] for p in response.data["projects"]] == ["Second Project", "Test Project"]
+        assert not [q for q in ctx.captured_queries if "project_" in q["sql"]]
+
+    def test_payloads_rebuilt_when_the_version_goes_back(self, authenticated_project_owner):
+        client, _, project = authenticated_project_owner
+        url = reverse("project-list")
+        client.get(url)
+        version = cache.get(f"project_version_{project.id}")
+
+        # Bumped by a host whose clock is behind
+        Project.objects.filter(id=project.id).update(title="Renamed")
+        cache.set(f"project_version_{project.id}", version - 10**9, timeout=None)
+
+        assert client.get(url).data["projects"][0]["title"] == "Renamed"
+
+    def test_project_update_moves_it_to_the_top(self, authenticated_project_owner, create_project, django_capture_on_commit_callbacks):
+        client, owner, project = authenticated_project_owner
+        create_project(owner=owner, title="Second Project")
+        url = reverse("project-list")
+        client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(reverse("project-update", kwargs={"id": project.id}), {"title": "Renamed"})
+
+        # Edited in place rather than reloaded
+        assert cache.get(f"project_list_{owner.id}")[0][1] == project.id
+        assert [p["title"] for p in client.get(url).data["projects"]] == ["Renamed", "Second Project"]
+
+    def test_membership_changes_update_the_list(self, authenticated_project_owner, create_project, django_capture_on_commit_callbacks):
+        client, owner, _ = authenticated_project_owner
+        other_project, _ = create_project(title="Other Project")
+        url = reverse("project-list")
+        client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            role = ProjectRole.objects.create(user=owner, project=other_project, role="READER")
+        assert client.get(url).data["total_records"] == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            role.delete()
+        response = client.get(url)
+        assert [p["title"] for p in response.data["projects"]] == ["Test Project"]
+
+
+@pytest.mark.django_db
+class TestDocumentDownloadAPI:
+
+    @pytest.fixture
+    def document(self, authenticated_project_owner, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        (tmp_path / "comment_documents").mkdir()
+        (tmp_path / "comment_documents" / "report.txt").write_bytes(bytes(range(256)) * 10)
+
+        client, owner, project = authenticated_project_owner
+        comment = Comment.objects.create(project=project, user=owner, content="With a document")
+        document = Document.objects.create(comment=comment, user=owner, file="comment_documents/report.txt")
+        return client, document, reverse("comment-document-download", kwargs={"pk": document.pk})
+
+    def test_download(self, document):
+        client, _, url = document
+
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert b"".join(response.streaming_content) == bytes(range(256)) * 10
+        assert response["Accept-Ranges"] == "bytes"
+        assert response["ETag"]
+        assert 'filename="report.txt"' in response["Content-Disposition"]
+
+    def test_download_range(self, document):
+        client, _, url = document
+
+        response = client.get(url, HTTP_RANGE="bytes=10-19")
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response["Content-Range"] == "bytes 10-19/2560"
+        assert b"".join(response.streaming_content) == bytes(range(10, 20))
+
+        response = client.get(url, HTTP_RANGE="bytes=-5")
+        assert b"".join(response.streaming_content) == bytes(range(251, 256))
+
+        response = client.get(url, HTTP_RANGE="bytes=5000-")
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response["Content-Range"] == "bytes */2560"
+
+    def test_download_not_modified(self, document):
+        client, _, url = document
+        etag = client.get(url)["ETag"]
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_download_x_accel_redirect(self, document, settings):
+        client, _, url = document
+        settings.DOCUMENT_DOWNLOAD_BACKEND = "x-accel-redirect"
+
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["X-Accel-Redirect"] == "/protected-media/comment_documents/report.txt"
+        assert response.content == b""
+
+    def test_download_not_member(self, document, create_user):
+        client, _, url = document
+        client.force_authenticate(user=create_user())
+
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestProjectCountersAPI:
+
+    def test_counters_follow_comments_documents_and_members(self, authenticated_project_owner, create_user, valid_file):
+        client, _, project = authenticated_project_owner
+        project.member_count = 1
+        project.save()
+
+        response = client.post(reverse("comment-create"), {"project": project.id, "content": "Hi", "files": [valid_file]}, format="multipart")
+        comment_id = response.data["id"]
+        client.post(reverse("add-member", kwargs={"id": project.id}), {"user_id": create_user().id, "role": "READER"})
+
+        data = client.get(reverse("project-detail", kwargs={"id": project.id})).data
+        assert (data["comment_count"], data["document_count"], data["member_count"]) == (1, 1, 2)
+        assert data["last_activity_at"] is not None
+
+        client.delete(reverse("comment-delete", kwargs={"pk": comment_id}))
+        project.refresh_from_db()
+        assert (project.comment_count, project.document_count) == (0, 0)
+
+    def test_recompute_project_counters_command(self, create_project, create_user):
+        project, owner = create_project()
+        comment = Comment.objects.create(project=project, user=owner, content="Hi")
+        Document.objects.create(comment=comment, user=owner, file="comments/doc.pdf")
+        ProjectRole.objects.create(user=create_user(), project=project, role="READER")
+
+        call_command("recompute_project_counters", stdout=StringIO())
+
+        project.refresh_from_db()
+        assert (project.comment_count, project.document_count, project.member_count) == (1, 1, 2)
+        assert project.last_activity_at == comment.created_at
+
+    def test_recompute_never_moves_last_activity_back(self, create_project):
+        project, owner = create_project()
+        quiet, _ = create_project(owner=owner, title="Quiet")
+        comment = Comment.objects.create(project=project, user=owner, content="Hi")
+        later = comment.created_at + timedelta(hours=1)
+        Project.objects.filter(id__in=[project.id, quiet.id]).update(last_activity_at=later)
+
+        # e.g. a document or a member added after the last comment, on a project without comments
+        recompute_project_counters()
+
+        project.refresh_from_db()
+        quiet.refresh_from_db()
+        assert project.last_activity_at == later
+        assert quiet.last_activity_at == later
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+
+    def test_comment_feed_uses_project_created_index(self):
+        queryset = Comment.objects.filter(project_id=1).order_by('-created_at', '-id')
+        plan = assert_uses_index(queryset, 'comment_project_created_idx')
+
+        if connection.vendor == 'sqlite':
+            assert 'TEMP B-TREE' not in plan  # The index already returns rows in feed order
+
+    def test_role_lookup_uses_covering_index(self):
+        queryset = ProjectRole.objects.filter(user_id=1).values_list('project_id', 'role')
+        assert_uses_index(queryset, 'projectrole_user_role_idx')
+
+    def test_project_list_does_not_scan(self):
+        assert_uses_index(Project.objects.filter(id__in=[1, 2, 3]).order_by('-updated_at', '-id'))
+        assert_uses_index(Project.objects.order_by('-updated_at', '-id')[:25], 'project_updated_idx')
+
+
 @pytest.mark.django_db
 class TestProjectEdgeCases:
     
@@ -341,3 +1005,105 @@ class TestProjectEdgeCases:
         response = client.patch(url, payload)
 
         assert response.status_code == status.HTTP_404_NOT_FOUND  # Cannot update a non-member
+
+
+class TestReadReplicaRouting:
+
+    def make_middleware(self, view, seen):
+        router = ReplicaRouter()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            seen.append(router.db_for_read(Project))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware
+
+    def test_safe_requests_to_replica_views_read_from_replica(self, settings, rf):
+        settings.DATABASE_REPLICAS = ["replica_1"]
+        seen = []
+        middleware = self.make_middleware(ProjectListAPIView.as_view(), seen)
+
+        middleware(rf.get("/", HTTP_AUTHORIZATION="Bearer a"))
+        middleware(rf.post("/", HTTP_AUTHORIZATION="Bearer b"))
+        middleware(rf.get("/", HTTP_AUTHORIZATION="Bearer c"))
+
+        # Reads outside of the request go back to the default database
+        assert seen == ["replica_1", "default", "replica_1"]
+        assert ReplicaRouter().db_for_read(Project) == "default"
+
+    def test_clients_read_their_own_writes(self, settings, rf):
+        settings.DATABASE_REPLICAS = ["replica_1"]
+        seen = []
+        middleware = self.make_middleware(ProjectListAPIView.as_view(), seen)
+
+        middleware(rf.post("/", HTTP_AUTHORIZATION="Bearer writer"))
+        middleware(rf.get("/", HTTP_AUTHORIZATION="Bearer writer"))
+        middleware(rf.get("/", HTTP_AUTHORIZATION="Bearer someone-else"))
+
+        assert seen == ["default", "default", "replica_1"]
+
+    def test_views_without_opt_in_use_default(self, settings, rf):
+        settings.DATABASE_REPLICAS = ["replica_1"]
+        seen = []
+        middleware = self.make_middleware(ProjectCreateAPIView.as_view(), seen)
+
+        middleware(rf.get("/", HTTP_AUTHORIZATION="Bearer a"))
+
+        assert seen == ["default"]
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+class TestReplicaDatabase:
+
+    @pytest.fixture
+    def replica(self, authenticated_project_owner, settings):
+        """Copies the owner and their project to the replica, with a comment only the replica has."""
+        client, owner, project = authenticated_project_owner
+        Comment.objects.create(project=project, user=owner, content="From the primary")
+        Project.objects.filter(id=project.id).update(comment_count=1)
+        settings.DATABASE_REPLICAS = ["replica"]
+
+        project.comment_count = 1
+        User.objects.using("replica").bulk_create([owner])
+        Project.objects.using("replica").bulk_create([project])
+        ProjectRole.objects.using("replica").bulk_create(list(ProjectRole.objects.filter(project=project)))
+        comment = Comment.objects.using("replica").create(project=project, user=owner, content="From the replica")
+        return client, owner, project, comment
+
+    def test_list_reads_land_on_the_replica(self, replica):
+        client, _, project, _ = replica
+
+        response = client.get(reverse("comment-list", kwargs={"project_id": project.id}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [c["content"] for c in response.data["comments"]] == ["From the replica"]
+
+    def test_detail_reads_land_on_the_replica(self, replica):
+        client, _, _, comment = replica
+
+        response = client.get(reverse("comment-detail", kwargs={"pk": comment.id}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["content"] == "From the replica"
+
+    def test_pinned_clients_read_from_default(self, replica):
+        client, _, project, _ = replica
+        url = reverse("comment-list", kwargs={"project_id": project.id})
+
+        response = client.post(reverse("comment-create"), {"project": project.id, "content": "Just written"})
+        assert response.status_code == status.HTTP_201_CREATED
+
+        response = client.get(url)
+        assert [c["content"] for c in response.data["comments"]] == ["Just written", "From the primary"]
+
+    def test_related_reads_follow_their_instance(self, replica):
+        _, owner, _, comment = replica
+        Document.objects.using("replica").create(comment=comment, user=owner, file="comment_documents/replica.pdf")
+
+        # Outside of a request reads go to default, but not reads from a replica's object
+        replica_comment = Comment.objects.using("replica").get(id=comment.id)
+        assert ReplicaRouter().db_for_read(Document, instance=replica_comment) == "replica"
+        assert [d.file.name for d in replica_comment.documents.all()] == ["comment_documents/replica.pdf"]
+        assert replica_comment.user._state.db == "replica"
@@ -0,0 +1,33 @@
+import json
+import uuid
+from decimal import Decimal
+from datetime import datetime, timezone as dt_timezone
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy
+from phonenumber_field.phonenumber import PhoneNumber
+from api.utils.renderers import CustomResponseRenderer
+
+
+class TestFastJSONRenderer:
+
+    def render(self, data):
+        renderer = CustomResponseRenderer()
+        return renderer.render(data, "application/json", {"response": HttpResponse(status=200)})
+
+    def test_matches_stdlib_rendering(self, monkeypatch):
+        data = {
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "price": Decimal("10.50"),
+            "created_at": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            "contact_number": PhoneNumber.from_string("+233201234567"),
+            "title": gettext_lazy("Project"),
+            "comments": [{"content": "Hello"}],
+        }
+
+        fast = self.render(data)
+        monkeypatch.setattr("api.utils.renderers.orjson", None)
+        stdlib = self.render(data)
+
+        assert fast == stdlib
+        assert json.loads(fast)["data"]["contact_number"] == "+233201234567"
+        assert json.loads(fast)["success"] is True
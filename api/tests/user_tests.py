@@ -1,8 +1,21 @@
 import pytest
+from datetime import timedelta
 from django.urls import reverse
 from unittest.mock import patch
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from apps.user.models import User
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.utils import timezone
+from django.core.cache import cache
+from io import StringIO
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from apps.user.activity import LastLoginTracker
+from apps.user.blacklist import blacklist_refresh_tokens
+from api.serializers.user import UserLoginSerializer
+from apps.user.authentication import StatelessJWTAuthentication
 
 @pytest.mark.django_db
 class TestUserAPI:
@@ -28,6 +41,81 @@ class TestUserAPI:
         assert response.status_code == status.HTTP_200_OK
         assert "access" in response.data["tokens"]
 
+    def test_user_login_checks_password_once(self, create_user, api_client):
+        user = create_user(password="StrongPassword123")
+        url = reverse("auth_login")
+
+        with patch.object(User, "check_password", autospec=True, side_effect=User.check_password) as check_password:
+            response = api_client.post(url, {"email": user.email, "password": "StrongPassword123"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert check_password.call_count == 1
+
+    def test_last_login_writes_are_throttled(self, create_user, api_client, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 0
+        user = create_user(password="StrongPassword123")
+        url = reverse("auth_login")
+        payload = {"email": user.email, "password": "StrongPassword123"}
+
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                assert api_client.post(url, payload).status_code == status.HTTP_200_OK
+
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE") and "last_login" in q["sql"]]
+        assert len(updates) == 1
+
+        user.refresh_from_db()
+        assert user.last_login is not None
+
+    def test_last_login_of_each_interval_is_written(self, create_user, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 3600
+        user = create_user()
+        tracker = LastLoginTracker()
+        first = timezone.now() - timedelta(minutes=1)
+        later = timezone.now()
+
+        tracker.record(user.pk, first)
+        assert tracker.flush() == 1
+        tracker.record(user.pk, later)
+
+        # Written at most once per interval, the later login waits in the queue
+        assert tracker.flush() == 0
+        user.refresh_from_db()
+        assert user.last_login == first
+
+        cache.delete(f"last_login_throttle_{user.pk}")  # The interval is over
+        assert tracker.flush() == 1
+        user.refresh_from_db()
+        assert user.last_login == later
+
+    def test_last_login_never_moves_backwards(self, create_user, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 3600
+        user = create_user()
+        latest = timezone.now()
+        User.objects.filter(pk=user.pk).update(last_login=latest)
+
+        # Another worker flushing an older login later
+        tracker = LastLoginTracker()
+        tracker.record(user.pk, latest - timedelta(minutes=5))
+        assert tracker.flush() == 1
+
+        user.refresh_from_db()
+        assert user.last_login == latest
+
+    def test_failed_last_login_flush_is_retried(self, create_user, settings):
+        settings.LAST_LOGIN_FLUSH_INTERVAL = 3600
+        user = create_user()
+        tracker = LastLoginTracker()
+        tracker.record(user.pk)
+
+        with patch("apps.user.activity.User.objects.filter", side_effect=DatabaseError):
+            with pytest.raises(DatabaseError):
+                tracker.flush()
+
+        assert tracker.flush() == 1
+        user.refresh_from_db()
+        assert user.last_login is not None
+
     def test_invalid_user_login(self, api_client):
         url = reverse("auth_login")
         payload = {"email": "wrong@example.com", "password": "wrongpass"}
@@ -65,6 +153,150 @@ class TestUserAPI:
         assert response.status_code == status.HTTP_200_OK
         assert response.data["detail"] == "Successfully logged out"
 
+    def test_logout_blacklists_every_refresh_token(self, create_user, api_client):
+        user = create_user()
+        refresh_tokens = [RefreshToken.for_user(user) for _ in range(3)]
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh_tokens[0].access_token}")
+
+        response = api_client.post(reverse("auth_logout"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert BlacklistedToken.objects.filter(token__user=user).count() == 3
+        # Logging out again finds nothing left to blacklist
+        assert blacklist_refresh_tokens(user.pk) == 0
+
+    def test_purge_expired_tokens(self, create_user):
+        user = create_user()
+        live = RefreshToken.for_user(user)
+        for _ in range(3):
+            RefreshToken.for_user(user)
+        expired = OutstandingToken.objects.exclude(jti=live["jti"])
+        blacklist_refresh_tokens(user.pk)
+        expired.update(expires_at=timezone.now() - timedelta(days=1))
+
+        call_command("purge_expired_tokens", "--batch-size", "2", stdout=StringIO())
+
+        assert list(OutstandingToken.objects.values_list("jti", flat=True)) == [live["jti"]]
+        assert BlacklistedToken.objects.count() == 1
+
+    def test_logout_blacklists_access_tokens(self, create_user, api_client):
+        user = create_user()
+        current = RefreshToken.for_user(user).access_token
+        other_session = RefreshToken.for_user(user).access_token
+        other_session.set_iat(at_time=other_session.current_time - timedelta(seconds=10))
+        url = reverse("account_detail")
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {other_session}")
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {current}")
+        assert api_client.post(reverse("auth_logout")).status_code == status.HTTP_200_OK
+        assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+        # Tokens issued before the logout are revoked as well, later ones are not
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {other_session}")
+        assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+        later = RefreshToken.for_user(user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {later}")
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+
+    def test_logout_revokes_tokens_sent_with_any_header_type(self, create_user, api_client):
+        user = create_user()
+        access = RefreshToken.for_user(user).access_token
+        url = reverse("account_detail")
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"JWT {access}")
+        assert api_client.get(url).status_code == status.HTTP_200_OK
+        assert api_client.post(reverse("auth_logout")).status_code == status.HTTP_200_OK
+
+        for header_type in ("JWT", "Bearer"):
+            api_client.credentials(HTTP_AUTHORIZATION=f"{header_type} {access}")
+            assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_token_claims_authenticate_without_user_query(self, create_project, create_user, api_client):
+        user = create_user(password="StrongPassword123")
+        create_project(owner=user)
+        response = api_client.post(reverse("auth_login"), {"email": user.email, "password": "StrongPassword123"})
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['tokens']['access']}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = api_client.get(reverse("project-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('FROM "user_user"' in q["sql"] for q in ctx.captured_queries)
+
+    def test_deactivated_user_tokens_are_revoked(self, create_project, api_client):
+        _, user = create_project()
+        refresh = UserLoginSerializer.get_token(user)
+        access = refresh.access_token
+        access.set_iat(at_time=access.current_time - timedelta(seconds=10))
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        assert api_client.get(reverse("project-list")).status_code == status.HTTP_200_OK
+
+        user.is_active = False
+        user.save()
+
+        assert api_client.get(reverse("project-list")).status_code == status.HTTP_401_UNAUTHORIZED
+        response = api_client.post(reverse("refresh-token"), {"refresh": str(refresh)})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_token_claims_build_the_right_user(self, create_user):
+        user = create_user(email_verified=False, bio="Kept in the database")
+        token = UserLoginSerializer.get_token(user).access_token
+
+        with CaptureQueriesContext(connection) as ctx:
+            claimed = StatelessJWTAuthentication().get_user(token)
+            assert (claimed.pk, claimed.username, claimed.email) == (user.pk, user.username, user.email)
+            assert claimed.email_verified is False
+            assert claimed.is_active is True
+        assert len(ctx.captured_queries) == 0
+
+        # Every other field is deferred and loaded on access
+        stored = User.objects.get(pk=user.pk)
+        for field in User._meta.concrete_fields:
+            assert getattr(claimed, field.attname) == getattr(stored, field.attname), field.attname
+
+    def test_unverified_user_is_rejected_with_token_claims(self, create_user, api_client):
+        user = create_user(email_verified=False)
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {UserLoginSerializer.get_token(user).access_token}")
+
+        response = api_client.patch(reverse("account_user_profile_update"), {"first_name": "Updated"})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_claim_changes_revoke_access_and_refresh_reads_new_claims(self, create_user, api_client):
+        user = create_user(email_verified=False)
+        refresh = UserLoginSerializer.get_token(user)
+        access = refresh.access_token
+        access.set_iat(at_time=access.current_time - timedelta(seconds=10))
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        assert api_client.get(reverse("account_detail")).status_code == status.HTTP_200_OK
+
+        user.email_verified = True
+        user.username = "renamed"
+        user.save()
+
+        # The access token still says unverified, so it is revoked
+        assert api_client.get(reverse("account_detail")).status_code == status.HTTP_401_UNAUTHORIZED
+
+        api_client.credentials()
+        response = api_client.post(reverse("refresh-token"), {"refresh": str(refresh)})
+        assert response.status_code == status.HTTP_200_OK
+        claims = AccessToken(response.data["access"])
+        assert (claims["username"], claims["email_verified"]) == ("renamed", True)
+
+    def test_saving_unchanged_claims_keeps_tokens(self, create_user, api_client):
+        user = create_user()
+        access = UserLoginSerializer.get_token(user).access_token
+        access.set_iat(at_time=access.current_time - timedelta(seconds=10))
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        user.first_name = "Renamed"
+        user.save()
+
+        assert api_client.get(reverse("account_detail")).status_code == status.HTTP_200_OK
+
     def test_get_user_details(self, authenticated_client):
         client, user = authenticated_client
         url = reverse("account_detail")
@@ -155,7 +387,7 @@ class TestUserAPI:
         client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
 
         # Simulate an unexpected exception (e.g., database error)
-        with patch("rest_framework_simplejwt.token_blacklist.models.BlacklistedToken.objects.bulk_create", side_effect=Exception("DB error")):
+        with patch("api.views.user.blacklist_refresh_tokens", side_effect=Exception("DB error")):
             response = client.post(url)
 
         assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -5,10 +5,14 @@ from api.views.project import (
     CommentCreateAPIView,
     CommentDeleteAPIView,
     CommentDetailAPIView,
+    CommentExportAPIView,
+    CommentImportAPIView,
     CommentListAPIView,
+    DownloadCommentDocumentAPIView,
     ProjectCreateAPIView,
     ProjectDetailAPIView,
     ProjectListAPIView,
+    ProjectMembersAPIView,
     ProjectUpdateAPIView,
     ProjectDeleteAPIView,
     UpdateMemberRoleAPIView,
@@ -44,14 +48,18 @@ urlpatterns = [
     path('projects/<int:id>/delete/', ProjectDeleteAPIView.as_view(), name='project-delete'),
     path('projects/<int:id>/add-member/', AddMemberAPIView.as_view(), name='add-member'),
     path('projects/<int:id>/update-member-role/', UpdateMemberRoleAPIView.as_view(), name='update-member-role'),
+    path('projects/<int:id>/members/', ProjectMembersAPIView.as_view(), name='project-members'),
     
     # Comments
     path('projects/<int:project_id>/comments/', CommentListAPIView.as_view(), name='comment-list'),
+    path('projects/<int:project_id>/comments/import/', CommentImportAPIView.as_view(), name='comment-import'),
+    path('projects/<int:project_id>/comments/export/', CommentExportAPIView.as_view(), name='comment-export'),
     path('comments/create/', CommentCreateAPIView.as_view(), name='comment-create'),
     path('comments/<int:pk>/', CommentDetailAPIView.as_view(), name='comment-detail'),
     path('comments/<int:pk>/delete/', CommentDeleteAPIView.as_view(), name='comment-delete'),
     
     # Documents
     path('comments/documents/create/', UploadCommentDocumentAPIView.as_view(), name='comment-document-upload'),
+    path('comments/documents/<int:pk>/download/', DownloadCommentDocumentAPIView.as_view(), name='comment-document-download'),
     
 ]
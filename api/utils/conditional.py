@@ -0,0 +1,44 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    View mixin that answers GETs with 304 Not Modified while the client's ETag or
+    Last-Modified is still current, before anything is loaded or serialized.
+
+    Views implement `get_validators()`, returning values that change whenever the response
+    would along with the timestamp of the last change (or None to skip), and call
+    `get_not_modified_response()` once permissions are checked.
+    """
+
+    etag = None
+    last_modified = None
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get_not_modified_response(self, request):
+        validators = self.get_validators()
+        if validators is None:
+            return None
+
+        values, last_modified = validators
+        # The full URL covers pagination parameters and the host used in `next`/`previous` links
+        digest = hashlib.md5(repr((request.build_absolute_uri(), values)).encode()).hexdigest()
+        self.etag = quote_etag(digest)
+        self.last_modified = int(last_modified)
+
+        return get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        if self.etag and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified)
+            # Clients may keep the response, but have to revalidate it before reuse
+            patch_cache_control(response, private=True, no_cache=True)
+
+        return response
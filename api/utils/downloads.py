@@ -0,0 +1,125 @@
+import os
+import re
+import hashlib
+import mimetypes
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Returns the (start, end) bytes, both inclusive, of a single range Range header.
+    Returns None to send the whole file, which is also what happens to ranges we don't
+    support (several ranges at once). Raises ValueError for unsatisfiable ranges.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # Suffix range, the last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise ValueError(header)
+
+    return start, end
+
+
+def read_range(file, start, end):
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = file.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+def serve_file(request, name, storage=default_storage):
+    """
+    Returns a download response for a stored file.
+
+    Storages without local paths (S3) redirect to the file's URL. Local files answer
+    conditional requests (ETag, Last-Modified) and single byte ranges, and are either
+    streamed by Django or, with settings.DOCUMENT_DOWNLOAD_BACKEND, handed over to the
+    web server through X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return HttpResponseRedirect(storage.url(name))
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found')
+
+    etag = quote_etag(hashlib.md5(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest())
+    last_modified = int(stat.st_mtime)
+
+    # 304 for a matching If-None-Match / If-Modified-Since, 412 for a failed If-Match
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    backend = getattr(settings, 'DOCUMENT_DOWNLOAD_BACKEND', '')
+
+    if backend == 'x-accel-redirect':
+        # nginx serves the bytes, ranges included, from an `internal` location
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, 'DOCUMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = stream_file(request, storage, name, stat.st_size, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def stream_file(request, storage, name, size, etag, content_type):
+    byte_range = None
+
+    # A client resuming with If-Range only gets a range of the version it already has
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = storage.open(name, 'rb')
+
+    if byte_range is None:
+        # Uses the server's wsgi.file_wrapper (sendfile) when there is one
+        return FileResponse(file, content_type=content_type)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(read_range(file, start, end), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
@@ -0,0 +1,50 @@
+from django.db.models import prefetch_related_objects
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin to declare the relations a serializer renders, so views can load
+    them up front instead of issuing a query per row.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+    @classmethod
+    def eager_load_instances(cls, instances):
+        """
+        Applies the same plan to instances that are already loaded, e.g. ones just created.
+        """
+        lookups = (*cls.select_related_fields, *cls.prefetch_related_fields)
+        if instances and lookups:
+            prefetch_related_objects(list(instances), *lookups)
+
+
+class EagerLoadingViewMixin:
+    """
+    Generic view mixin that applies the serializer's query plan to the view's queryset.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+
+        return queryset
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, 'eager_load_instances'):
+            serializer_class.eager_load_instances([serializer.instance])
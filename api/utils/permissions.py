@@ -1,5 +1,6 @@
 from rest_framework import permissions
-from apps.project.models import Comment, ProjectRole
+from apps.project.models import Comment
+from api.utils.roles import EDITOR_ROLES, OWNER_ROLES, get_project_roles, has_project_role
 
 
 class IsEmailVerified(permissions.BasePermission):
@@ -23,9 +24,7 @@ class IsProjectOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return ProjectRole.objects.filter(
-            user=request.user, project=obj, role='OWNER'
-        ).exists()
+        return has_project_role(request, obj.pk, OWNER_ROLES)
 
 class IsProjectEditorOrHigher(permissions.BasePermission):
     """
@@ -33,9 +32,7 @@ class IsProjectEditorOrHigher(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return ProjectRole.objects.filter(
-            user=request.user, project=obj, role__in=['OWNER', 'EDITOR']
-        ).exists()
+        return has_project_role(request, obj.pk, EDITOR_ROLES)
 
 class IsProjectMember(permissions.BasePermission):
     """
@@ -44,12 +41,11 @@ class IsProjectMember(permissions.BasePermission):
     
     def has_permission(self, request, view):
         # For api views that don't trigger 'has_object_permission' method
-        return ProjectRole.objects.filter(user=request.user).exists()
+        return bool(get_project_roles(request))
 
     def has_object_permission(self, request, view, obj):
-        print('Object:', obj)
         # Makes sure the user is a member of the specific project they are accessing 
-        return ProjectRole.objects.filter(user=request.user, project=obj).exists()
+        return has_project_role(request, obj.pk)
 
 class CanCommentOnProject(permissions.BasePermission):
     """
@@ -65,9 +61,7 @@ class CanCommentOnProject(permissions.BasePermission):
         if not project_id:
             return False
 
-        return ProjectRole.objects.filter(
-            user=request.user, project_id=project_id, role__in=['OWNER', 'EDITOR']
-        ).exists()
+        return has_project_role(request, project_id, EDITOR_ROLES)
 
 
 class CanUploadCommentDocument(permissions.BasePermission):
@@ -84,15 +78,11 @@ class CanUploadCommentDocument(permissions.BasePermission):
         if not comment_id:
             return False
 
-        comment_obj = Comment.objects.filter(id=comment_id).first()
+        # Only the project id is needed from the comment
+        project_id = Comment.objects.filter(id=comment_id).values_list('project_id', flat=True).first()
 
-        if comment_obj:
-            # get the project instance from comment
-            project = comment_obj.project
-
-            return ProjectRole.objects.filter(
-                user=request.user, project=project, role__in=['OWNER', 'EDITOR']
-            ).exists()
+        if project_id:
+            return has_project_role(request, project_id, EDITOR_ROLES)
         
         return False
 
@@ -103,12 +93,8 @@ class IsProjectOwnerOrCommentOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        # Get project instance from comment object
-        project = obj.project
-        
-        if not project:
+        # Get project id from comment object
+        if not obj.project_id:
             return False
 
-        return ProjectRole.objects.filter(
-            user=request.user, project=project, role__in=['OWNER']
-        ).exists() or obj.user == request.user
+        return has_project_role(request, obj.project_id, OWNER_ROLES) or obj.user_id == request.user.pk
@@ -1,9 +1,51 @@
 from rest_framework import serializers
 from drf_spectacular.utils import OpenApiResponse
+from phonenumber_field.phonenumber import PhoneNumber
 from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class CustomResponseRenderer(JSONRenderer):
+
+class ResponseEncoder(JSONEncoder):
+    """
+    DRF's encoder, plus phone numbers.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, PhoneNumber):
+            return str(obj)
+        return super().default(obj)
+
+
+# orjson handles dicts, lists and UUIDs itself. Anything else, datetimes included so that
+# they keep DRF's format (millisecond precision, "Z" for UTC), is encoded as above.
+_orjson_default = ResponseEncoder().default
+_orjson_options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it's installed. Falls back to DRF's encoder
+    without it, or when the client asks for indented output.
+    """
+
+    encoder_class = ResponseEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(data, default=_orjson_default, option=_orjson_options)
+
+
+class CustomResponseRenderer(FastJSONRenderer):
     '''
     A custom Renderer to make all responses return a success key by default
     '''
@@ -20,11 +62,10 @@ class CustomResponseRenderer(JSONRenderer):
             response = {"success": True, "data": data}
         else:
             if self.res == "data":
+                # Nested as is, copying it would only cost time
                 response = {
                     "success": True,
-                    "data": {
-                        **data,
-                    },
+                    "data": data,
                 }
             else:
                 response = {
@@ -41,7 +82,7 @@ class CustomResponseRenderer(JSONRenderer):
         return super(CustomResponseRenderer, self).render(response, accepted_media_type, renderer_context)
 
 
-class LoginRenderer(JSONRenderer):
+class LoginRenderer(FastJSONRenderer):
     def render(self, data, accepted_media_type=None, renderer_context=None):
         status_code = renderer_context['response'].status_code
         if data is None:
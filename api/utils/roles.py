@@ -0,0 +1,49 @@
+from apps.project.cache import get_cached_project_roles
+
+
+OWNER_ROLES = ('OWNER',)
+EDITOR_ROLES = ('OWNER', 'EDITOR')
+
+
+def get_project_roles(request):
+    """
+    Returns the authenticated user's {project_id: role} map.
+    The map is read from the shared cache (or the database on a miss) the first time it
+    is needed and then reused by every permission class and view for the rest of the request.
+    """
+    roles = getattr(request, '_project_roles', None)
+
+    if roles is None:
+        user = getattr(request, 'user', None)
+
+        if user is None or not user.is_authenticated:
+            roles = {}
+        else:
+            roles = get_cached_project_roles(user.pk)
+        request._project_roles = roles
+
+    return roles
+
+
+def get_project_role(request, project_id):
+    """
+    Returns the user's role in the given project, or None if they are not a member.
+    """
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return None
+
+    return get_project_roles(request).get(project_id)
+
+
+def has_project_role(request, project_id, roles=None):
+    """
+    Checks if the user is a member of the project, optionally restricted to the given roles.
+    """
+    role = get_project_role(request, project_id)
+
+    if role is None:
+        return False
+
+    return roles is None or role in roles
@@ -1,13 +1,25 @@
+import csv
+import json
 from rest_framework import status, generics, exceptions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db import IntegrityError, router, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from drf_spectacular.utils import extend_schema, extend_schema_view
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from api.pagination import CommentsPagination, ProjectsPagination
+from api.utils.conditional import ConditionalGetMixin
+from api.utils.downloads import serve_file
+from api.utils.eager_loading import EagerLoadingViewMixin
 from api.utils.renderers import get_standard_response
-from apps.project.models import Comment, Project, ProjectRole
+from api.utils.roles import EDITOR_ROLES, OWNER_ROLES, get_project_roles, has_project_role
+from apps.project.cache import get_cached_project_list, get_cached_project_payload, get_cached_project_payloads, get_project_version
+from apps.project.counters import update_project_counters
+from apps.project.models import Comment, Document, Project, ProjectRole
+from apps.project.signals import invalidate_projects, invalidate_user_roles, move_in_project_lists
 from rest_framework.permissions import IsAuthenticated
-from api.serializers.project import CommentCreateSerializer, CommentSerializer, DocumentSerializer, ProjectRoleSerializer, ProjectSerializer, ProjectUpdateSerializer
+from api.serializers.project import CommentCreateSerializer, CommentImportSerializer, CommentSerializer, DocumentSerializer, ProjectMemberItemSerializer, ProjectMembersSerializer, ProjectRoleSerializer, ProjectSerializer, ProjectUpdateSerializer
 from api.utils.permissions import (
     CanCommentOnProject,
     CanUploadCommentDocument,
@@ -17,6 +29,29 @@ from api.utils.permissions import (
     IsProjectOwnerOrCommentOwner
 )
 from apps.user.models import User
+from pma.routers import read_from_primary
+
+
+def get_project_validators(project_id):
+    """
+    Returns values that change with anything rendered about a project or its comments, and the
+    timestamp of the last change, from one small query and a cache read. None if there's no such project.
+    Counters and last_activity_at follow comments and documents, the project version follows
+    members, roles and member profiles.
+    """
+    row = (
+        Project.objects.filter(id=project_id)
+        .values_list('updated_at', 'last_activity_at', 'comment_count', 'document_count', 'member_count')
+        .first()
+    )
+    if row is None:
+        return None
+
+    version = get_project_version(project_id)
+    updated_at, last_activity_at = row[0], row[1] or row[0]
+    last_modified = max(updated_at.timestamp(), last_activity_at.timestamp(), version / 1e9)
+
+    return (*row, version), last_modified
 
 
 # PROJECTS
@@ -31,14 +66,39 @@ from apps.user.models import User
         200: get_standard_response(ProjectSerializer, many=True)
     }
 ))
-class ProjectListAPIView(generics.ListAPIView):
+class ProjectListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ProjectSerializer
+    use_read_replica = True  # Safe requests may be served by a read replica
     permission_classes = [IsAuthenticated, IsProjectMember] # Any project memnber can view their projects
     pagination_class = ProjectsPagination
 
     def get_queryset(self):
-        queryset = Project.objects.filter(projectrole__user=self.request.user).distinct()
-        return queryset.order_by('-updated_at')
+        # The role map is already loaded by IsProjectMember, so no join on projectrole is needed here
+        queryset = Project.objects.filter(id__in=list(get_project_roles(self.request)))
+        return queryset.order_by('-updated_at', '-id')
+
+    def get_total_count(self):
+        # Used by ProjectsPagination instead of a COUNT(*) query
+        return len(get_project_roles(self.request))
+
+    def list(self, request, *args, **kwargs):
+        # Keyset pages are read straight from the database
+        if self.paginator.wants_cursor(request):
+            return super().list(request, *args, **kwargs)
+
+        # Numbered pages are a slice of the user's cached project list, filled from cached payloads
+        project_ids = get_cached_project_list(request.user.pk, list(get_project_roles(request)))
+        page = self.paginate_queryset(project_ids)
+        # Payloads rendered with the request have absolute URLs, so they are cached per host
+        payloads = get_cached_project_payloads(page, self.build_payloads, variant=request.build_absolute_uri('/'))
+
+        return self.get_paginated_response([payloads[project_id] for project_id in page if project_id in payloads])
+
+    def build_payloads(self, project_ids):
+        # Cached for everyone, so never built from a lagging replica
+        with read_from_primary():
+            projects = self.filter_queryset(Project.objects.filter(id__in=project_ids))
+            return {payload['id']: payload for payload in self.get_serializer(projects, many=True).data}
 
 
 @extend_schema_view(post=extend_schema(
@@ -55,12 +115,14 @@ class ProjectCreateAPIView(APIView):
     def post(self, request):
         serializer = ProjectSerializer(data=request.data)
         if serializer.is_valid():
-            project = serializer.save()
-            ProjectRole.objects.create(
-                user=request.user,
-                project=project,
-                role='OWNER'
-            )
+            with transaction.atomic():
+                # The creator is the first member
+                project = serializer.save(member_count=1)
+                ProjectRole.objects.create(
+                    user=request.user,
+                    project=project,
+                    role='OWNER'
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -72,25 +134,46 @@ class ProjectCreateAPIView(APIView):
     tags=["Projects"],
     responses={200: get_standard_response(ProjectSerializer)}
 ))
-class ProjectDetailAPIView(generics.RetrieveAPIView):
+class ProjectDetailAPIView(ConditionalGetMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
+    serializer_class = ProjectSerializer
+    use_read_replica = True
     permission_classes = [IsAuthenticated, IsProjectMember] # Any project memnber can view a single project
     lookup_field = 'id'
+    project_version = None
 
-    def get_object(self, id):
-        proj =  Project.objects.filter(id=id, projectrole__user=self.request.user).first()
-        
-        if not proj:
+    def get_validators(self):
+        validators = get_project_validators(self.kwargs['id'])
+        if validators is not None:
+            # The project version is the last validator value
+            self.project_version = validators[0][-1]
+        return validators
+
+    def get(self, request, id):
+        if not has_project_role(request, id):
             raise exceptions.NotFound('Project not found')
-        
-        # Manually trigger permission check
-        self.check_object_permissions(self.request, proj)
 
-        return proj
+        # Unchanged since the client's copy, skip loading and serializing it
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
 
-    def get(self, request, id):
-        project = self.get_object(id)
-        serializer = ProjectSerializer(project)
-        return Response(serializer.data)
+        # The payload is shared by all members, only the permission check above is per user
+        version, payload = get_cached_project_payload(id, lambda: self.build_payload(id))
+        if payload is None:
+            raise exceptions.NotFound('Project not found')
+
+        if version != self.project_version:
+            # A stale payload served while another request rebuilds it must not carry the
+            # current validators, or revalidating would keep the client on it
+            self.etag = None
+
+        return Response(payload)
+
+    def build_payload(self, id):
+        # Cached for everyone, so never built from a lagging replica
+        with read_from_primary():
+            project = self.filter_queryset(Project.objects.filter(id=id)).first()
+            return ProjectSerializer(project).data if project else None
 
 
 @extend_schema_view(put=extend_schema(
@@ -167,7 +250,7 @@ class AddMemberAPIView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if not ProjectRole.objects.filter(user=request.user, project=project, role='OWNER').exists():
+        if not has_project_role(request, project.id, OWNER_ROLES):
             return Response({'detail': 'Only owners can add members'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
@@ -178,7 +261,10 @@ class AddMemberAPIView(APIView):
         if ProjectRole.objects.filter(user=user, project=project).exists():
             return Response({'detail': 'User is already a member'}, status=status.HTTP_400_BAD_REQUEST)
         
-        ProjectRole.objects.create(user=user, project=project, role=serializer.validated_data['role'])
+        with transaction.atomic():
+            ProjectRole.objects.create(user=user, project=project, role=serializer.validated_data['role'])
+            update_project_counters(project.id, touch=False, member_count=1)
+
         return Response({'message': f'{user.username.title()} successfully added to project {project.title}'}, status=status.HTTP_201_CREATED)
 
 
@@ -203,7 +289,7 @@ class UpdateMemberRoleAPIView(APIView):
         member_id = request.data.get('user_id')
         new_role = request.data.get('role')
         
-        if not ProjectRole.objects.filter(user=request.user, project=project, role='OWNER').exists():
+        if not has_project_role(request, project.id, OWNER_ROLES):
             return Response({'detail': 'Only owners can update member roles'}, status=status.HTTP_403_FORBIDDEN)
         
         try:
@@ -218,6 +304,115 @@ class UpdateMemberRoleAPIView(APIView):
         return Response({'message': 'role updated'}, status=status.HTTP_200_OK)
 
 
+@extend_schema_view(post=extend_schema(
+    summary="Add or Update Project Members",
+    description="Add many members to a project, or change their roles, in one request. Only owners can perform this action. "
+                "Every item gets its own result: `created`, `updated`, `unchanged`, `invalid`, `user_not_found` or `duplicate`.",
+    methods=['post'],
+    tags=["Project Members"],
+    request=ProjectMembersSerializer,
+    responses={200: "{'created': 1, 'updated': 1, 'results': [{'user_id': 2, 'role': 'EDITOR', 'status': 'created'}, ...]}"}
+))
+class ProjectMembersAPIView(APIView):
+    """
+    Bulk version of AddMemberAPIView and UpdateMemberRoleAPIView. Costs the same handful of
+    queries however many members are sent.
+    """
+    permission_classes = [IsAuthenticated, IsProjectOwner]  # Only owners can manage members
+
+    def post(self, request, id):
+        project = get_object_or_404(Project, id=id)
+        serializer = ProjectMembersSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if not has_project_role(request, project.id, OWNER_ROLES):
+            return Response({'detail': 'Only owners can manage members'}, status=status.HTTP_403_FORBIDDEN)
+
+        results = []
+        requested = {}  # user_id -> result of the item that applies to the user
+
+        for item in serializer.validated_data['members']:
+            item_serializer = ProjectMemberItemSerializer(data=item)
+            if not item_serializer.is_valid():
+                results.append({'status': 'invalid', 'errors': item_serializer.errors})
+                continue
+
+            result = {**item_serializer.validated_data, 'status': None}
+            if result['user_id'] in requested:
+                # The last item for a user wins
+                requested[result['user_id']]['status'] = 'duplicate'
+            requested[result['user_id']] = result
+            results.append(result)
+
+        user_ids = list(requested)
+        existing_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        existing_roles = {
+            role.user_id: role
+            for role in ProjectRole.objects.filter(project=project, user_id__in=user_ids)
+        }
+
+        new_roles = []
+        changed_roles = []
+
+        for user_id, result in requested.items():
+            if user_id not in existing_users:
+                result['status'] = 'user_not_found'
+            elif user_id not in existing_roles:
+                new_roles.append(ProjectRole(project=project, user_id=user_id, role=result['role']))
+                result['status'] = 'created'
+            elif existing_roles[user_id].role != result['role']:
+                existing_roles[user_id].role = result['role']
+                changed_roles.append(existing_roles[user_id])
+                result['status'] = 'updated'
+            else:
+                result['status'] = 'unchanged'
+
+        if new_roles or changed_roles:
+            with transaction.atomic():
+                new_roles = self.create_roles(new_roles, requested)
+                ProjectRole.objects.bulk_update(changed_roles, ['role'])
+
+                if new_roles:
+                    update_project_counters(project.id, touch=False, member_count=len(new_roles))
+
+                # Bulk writes don't send the signals that keep the role caches fresh
+                invalidate_user_roles(*(role.user_id for role in new_roles + changed_roles))
+                invalidate_projects(project.id)
+                move_in_project_lists((role.user_id for role in new_roles), project.id, project.updated_at)
+
+        return Response({
+            'created': len(new_roles),
+            'updated': len(changed_roles),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+    def create_roles(self, roles, requested):
+        """
+        Inserts the roles, returns the ones that were created. A concurrent request may
+        have added some of these members since they were read, those are reported as
+        conflicts instead of failing the whole batch.
+        """
+        try:
+            with transaction.atomic():
+                ProjectRole.objects.bulk_create(roles)
+            return roles
+        except IntegrityError:
+            pass
+
+        created = []
+        for role in roles:
+            try:
+                with transaction.atomic():
+                    ProjectRole.objects.bulk_create([role])
+            except IntegrityError:
+                requested[role.user_id]['status'] = 'conflict'
+            else:
+                created.append(role)
+        return created
+
+
 # COMMENTS
 
 @extend_schema_view(get=extend_schema(
@@ -227,17 +422,112 @@ class UpdateMemberRoleAPIView(APIView):
     tags=["Comments"],
     responses={200: get_standard_response(CommentSerializer, many=True)}
 ))
-class CommentListAPIView(generics.ListAPIView):
+class CommentListAPIView(ConditionalGetMixin, EagerLoadingViewMixin, generics.ListAPIView):
     """
     API view to list comments under a project. Only members can view comments.
     """
     serializer_class = CommentSerializer
+    use_read_replica = True
     permission_classes = [IsAuthenticated, IsProjectMember]
     pagination_class = CommentsPagination
 
     def get_queryset(self):
         project_id = self.kwargs.get('project_id')
-        return Comment.objects.filter(project_id=project_id).order_by('-created_at')
+        return Comment.objects.filter(project_id=project_id).order_by('-created_at', '-id')
+
+    def get_total_count(self):
+        # Used by CommentsPagination instead of a COUNT(*) query
+        project_id = self.kwargs.get('project_id')
+        return Project.objects.filter(id=project_id).values_list('comment_count', flat=True).first() or 0
+
+    def get_validators(self):
+        return get_project_validators(self.kwargs.get('project_id'))
+
+    def get(self, request, *args, **kwargs):
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+        return super().get(request, *args, **kwargs)
+
+
+class Echo:
+    """
+    File-like object whose write() hands the value back, so csv.writer can build rows for streaming.
+    """
+
+    def write(self, value):
+        return value
+
+
+@extend_schema_view(get=extend_schema(
+    summary="Export Project Comments",
+    description="Stream every comment of a project as NDJSON (default) or CSV (`?export_format=csv`). Only members can export comments.",
+    methods=['get'],
+    tags=["Comments"],
+    parameters=[OpenApiParameter('export_format', str, enum=['ndjson', 'csv'], required=False)],
+    responses={200: "{'id': 1, 'created_at': '...', 'user_id': 2, 'username': 'john', 'email': 'john@example.com', 'content': '...', 'documents': ['...']}"}
+))
+class CommentExportAPIView(APIView):
+    """
+    Streams a project's comments in constant memory, reading them `chunk_size` rows at a
+    time through a server-side cursor where the database supports one.
+    """
+    use_read_replica = True
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+    # `format` is taken by DRF's format suffixes
+    format_query_param = 'export_format'
+    fields = ('id', 'created_at', 'user_id', 'username', 'email', 'content', 'documents')
+
+    def get(self, request, project_id):
+        if not has_project_role(request, project_id):
+            return Response({'detail': 'Only members can export comments'}, status=status.HTTP_403_FORBIDDEN)
+
+        export_format = request.query_params.get(self.format_query_param, 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return Response({'detail': 'Unsupported export format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve the database now, the rows are read after the routing middleware has finished
+        queryset = (
+            Comment.objects.using(router.db_for_read(Comment))
+            .filter(project_id=project_id)
+            .select_related('user')
+            .only('id', 'created_at', 'content', 'user__id', 'user__username', 'user__email')
+            .prefetch_related(Prefetch('documents', queryset=Document.objects.only('id', 'file', 'comment_id')))
+            .order_by('created_at', 'id')
+        )
+        rows = (self.get_row(comment) for comment in queryset.iterator(chunk_size=self.chunk_size))
+
+        if export_format == 'csv':
+            response = StreamingHttpResponse(self.stream_csv(rows), content_type='text/csv')
+        else:
+            response = StreamingHttpResponse(self.stream_ndjson(rows), content_type='application/x-ndjson')
+
+        response['Content-Disposition'] = f'attachment; filename="project-{project_id}-comments.{export_format}"'
+        return response
+
+    def get_row(self, comment):
+        return {
+            'id': comment.id,
+            'created_at': comment.created_at.isoformat(),
+            'user_id': comment.user.id,
+            'username': comment.user.username,
+            'email': comment.user.email,
+            'content': comment.content,
+            'documents': [document.file.name for document in comment.documents.all()],
+        }
+
+    def stream_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(row) + '\n'
+
+    def stream_csv(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+
+        for row in rows:
+            row['documents'] = ' '.join(row['documents'])
+            yield writer.writerow([row[field] for field in self.fields])
 
 
 @extend_schema_view(post=extend_schema(
@@ -248,7 +538,7 @@ class CommentListAPIView(generics.ListAPIView):
     request=CommentCreateSerializer,
     responses={201: get_standard_response(CommentCreateSerializer)}
 ))
-class CommentCreateAPIView(generics.CreateAPIView):
+class CommentCreateAPIView(EagerLoadingViewMixin, generics.CreateAPIView):
     """
     API view to create a new comment on a project.
     """
@@ -256,6 +546,92 @@ class CommentCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated, CanCommentOnProject] # Only owners and editors can comment.
 
 
+@extend_schema_view(post=extend_schema(
+    summary="Import Comments",
+    description="Create many comments on a project in one request, from a JSON array or an NDJSON stream "
+                "(`Content-Type: application/x-ndjson`). Only owners and editors can import comments, which are all authored by the importing user. "
+                "Results are streamed back as NDJSON, one line per record: `created` with the comment id, or `invalid` with the errors.",
+    methods=['post'],
+    tags=["Comments"],
+    request=CommentImportSerializer(many=True),
+    responses={200: "{'index': 0, 'status': 'created', 'id': 12}"}
+))
+class CommentImportAPIView(APIView):
+    """
+    Bulk comment ingestion. Membership is checked once per request and comments are
+    inserted with bulk_create, `chunk_size` at a time.
+    """
+    permission_classes = [IsAuthenticated]
+    chunk_size = 500
+    ndjson_content_types = ('application/x-ndjson', 'application/jsonl')
+
+    def post(self, request, project_id):
+        if not has_project_role(request, project_id, EDITOR_ROLES):
+            return Response({'detail': 'Only owners and editors can import comments'}, status=status.HTTP_403_FORBIDDEN)
+
+        # The body is read straight from the stream, request.data would load all of it at once
+        if request.content_type.split(';')[0].strip() in self.ndjson_content_types:
+            records = self.read_ndjson(request.stream)
+        else:
+            try:
+                records = json.load(request.stream) if request.stream else []
+            except ValueError:
+                raise exceptions.ParseError('Expected a JSON array or an NDJSON stream of comments')
+            if not isinstance(records, list):
+                raise exceptions.ParseError('Expected a JSON array or an NDJSON stream of comments')
+
+        return StreamingHttpResponse(
+            self.import_comments(records, project_id, request.user.pk),
+            content_type='application/x-ndjson',
+        )
+
+    def read_ndjson(self, stream):
+        if stream is None:
+            return
+
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                # Reported as an invalid record, the rest of the stream is still imported
+                yield e
+
+    def import_comments(self, records, project_id, user_id):
+        chunk = []
+
+        for index, record in enumerate(records):
+            if isinstance(record, ValueError):
+                yield self.encode_result(index, 'invalid', errors={'detail': f'Invalid JSON: {record}'})
+                continue
+
+            serializer = CommentImportSerializer(data=record)
+            if not serializer.is_valid():
+                yield self.encode_result(index, 'invalid', errors=serializer.errors)
+                continue
+
+            chunk.append((index, Comment(project_id=project_id, user_id=user_id, content=serializer.validated_data['content'])))
+
+            if len(chunk) >= self.chunk_size:
+                yield from self.create_comments(chunk, project_id)
+                chunk = []
+
+        if chunk:
+            yield from self.create_comments(chunk, project_id)
+
+    def create_comments(self, chunk, project_id):
+        with transaction.atomic():
+            comments = Comment.objects.bulk_create([comment for _, comment in chunk])
+            update_project_counters(project_id, comment_count=len(comments))
+
+        for (index, _), comment in zip(chunk, comments):
+            yield self.encode_result(index, 'created', id=comment.id)
+
+    def encode_result(self, index, result_status, **extra):
+        return json.dumps({'index': index, 'status': result_status, **extra}) + '\n'
+
+
 @extend_schema_view(get=extend_schema(
     summary="Retrieve Comment",
     description="Retrieve details of a specific comment.",
@@ -263,12 +639,13 @@ class CommentCreateAPIView(generics.CreateAPIView):
     tags=["Comments"],
     responses={200: get_standard_response(CommentSerializer)}
 ))
-class CommentDetailAPIView(generics.RetrieveAPIView):
+class CommentDetailAPIView(EagerLoadingViewMixin, generics.RetrieveAPIView):
     """
     API view to retrieve a specific comment.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    use_read_replica = True
     permission_classes = [IsAuthenticated]
 
 
@@ -287,6 +664,13 @@ class CommentDeleteAPIView(generics.DestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsProjectOwnerOrCommentOwner] # Comment creator or project owner can delete a comment
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            document_count = instance.documents.count()
+            project_id = instance.project_id
+            instance.delete()
+            update_project_counters(project_id, comment_count=-1, document_count=-document_count)
+
 
 # COMMENT DOCUMENTS
 @extend_schema_view(post=extend_schema(
@@ -305,8 +689,32 @@ class UploadCommentDocumentAPIView(APIView):
         ser = self.serializer_class(data=request.data, context={'request':request})
 
         if ser.is_valid(raise_exception=True):
-            ser.save()
+            with transaction.atomic():
+                document = ser.save()
+                update_project_counters(document.comment.project_id, document_count=1)
             return Response({'message': 'document uploaded successfully'}, status=status.HTTP_200_OK)
 
 
+@extend_schema_view(get=extend_schema(
+    summary="Download Comment Document",
+    description="Download a comment document. Only project members can download documents. "
+                "Supports `Range` requests (206) and `If-None-Match`/`If-Modified-Since` (304). With S3 storage this redirects to the file.",
+    methods=['get'],
+    tags=["Comments"],
+    responses={200: "File content", 206: "Partial file content", 302: "Redirect to the file (S3)", 304: "Not Modified"}
+))
+class DownloadCommentDocumentAPIView(APIView):
+    use_read_replica = True
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        document = Document.objects.filter(pk=pk).values_list('file', 'comment__project_id').first()
+        if document is None:
+            return Response({'detail': 'Document not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        name, project_id = document
+        if not has_project_role(request, project_id):
+            return Response({'detail': 'Only members can download documents'}, status=status.HTTP_403_FORBIDDEN)
+
+        return serve_file(request, name)
 
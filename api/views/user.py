@@ -1,17 +1,17 @@
 import logging
-from datetime import datetime
-from django.core.cache import cache
-from django.utils import timezone
 from apps.user.models import User
+from apps.user.activity import record_login
+from apps.user.authentication import StatelessJWTAuthentication
+from apps.user.blacklist import blacklist_refresh_tokens, blacklist_token, revoke_user_tokens
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from rest_framework.response import Response
 from api.utils.permissions import IsEmailVerified
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken, TokenError
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, TokenError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from api.serializers.user import (
     CustomTokenRefreshSerializer,
     RegisteredUserResponseSerializer,
@@ -43,20 +43,18 @@ class UserLoginView(TokenObtainPairView):
     authentication_classes = []
     
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        
-        # If login was successful, update last_login
-        if response.status_code == 200:
-            # The user will be available in the serializer
-            serializer = self.get_serializer(data=request.data)
+        # Validate once: checking the password hash is the expensive part of a login
+        serializer = self.get_serializer(data=request.data)
+
+        try:
             serializer.is_valid(raise_exception=True)
-            user = serializer.user
-            
-            # Update last_login field only
-            user.last_login = timezone.now()
-            user.save(update_fields=['last_login'])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
 
-        return response
+        # Coalesced with other logins and written in batches
+        record_login(serializer.user.pk)
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(post=extend_schema(
@@ -97,7 +95,7 @@ class UserRegisterView(APIView):
             # This is where we send the user a verification mail with an otp code/link
 
             data = {}
-            refresh = RefreshToken.for_user(user)
+            refresh = UserLoginSerializer.get_token(user)
             data['user']        = self.user_serializer_class(user).data
             data['tokens'] = {
                 'access': str(refresh.access_token),
@@ -119,44 +117,28 @@ class UserLogoutView(APIView):
 
     def post(self, request, *args, **kwargs):
         try:
-            # Get the auth header
-            auth_header = request.headers.get('Authorization', '')
-            if not auth_header.startswith('Bearer '):
+            # Get the access token, sent with any of the accepted header types
+            authentication = StatelessJWTAuthentication()
+            header = authentication.get_header(request)
+            raw_token = authentication.get_raw_token(header) if header is not None else None
+            if raw_token is None:
                 return Response({'detail': 'Invalid token format'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Extract the access token
-            access_token_str = auth_header.split(' ')[1]
-            
+
             try:
                 # Parse the access token
-                access_token = AccessToken(access_token_str)
-                
-                # Calculate token's remaining lifetime
-                token_exp = datetime.fromtimestamp(access_token['exp'])
-                remaining_time = (token_exp - datetime.now()).total_seconds()
-                
-                # Add the access token to cache blacklist
-                if remaining_time > 0:
-                    cache.set(f'blacklisted_token_{access_token_str}', 'blacklisted', timeout=int(remaining_time))
+                access_token = AccessToken(raw_token)
+
+                # Blacklist this token by its jti, and every other access token issued to the user so far
+                blacklist_token(access_token.payload)
+                revoke_user_tokens(request.user.pk)
             
             except TokenError:
                 pass  # Token might be invalid, continue with refresh token blacklisting
             
-            # Blacklist all refresh tokens for the user
-            refresh_tokens = OutstandingToken.objects.filter(
-                user=request.user,
-                blacklistedtoken__isnull=True
-            )
-            
-            if not refresh_tokens:
+            # Blacklist all refresh tokens for the user, in a single statement
+            if not blacklist_refresh_tokens(request.user.pk):
                 return Response({'detail': "No active sessions found"}, status=status.HTTP_200_OK)
 
-            # Blacklist all refresh tokens
-            BlacklistedToken.objects.bulk_create([
-                BlacklistedToken(token=token)
-                for token in refresh_tokens
-            ])
-
             return Response({'detail': 'Successfully logged out'}, status=status.HTTP_200_OK)
             
         except Exception as e:
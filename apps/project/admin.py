@@ -53,9 +53,9 @@ class ProjectRoleInlineAdmin(EditLinkToInlineObject, admin.TabularInline):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['title','created_at', 'updated_at']
+    list_display = ['title','created_at', 'updated_at', 'member_count', 'comment_count']
     list_display_links = ['title','created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'comment_count', 'document_count', 'member_count', 'last_activity_at']
     ordering = ['-updated_at']
 
     list_filter = (
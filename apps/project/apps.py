@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProjectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.project'
+
+    def ready(self):
+        # Register signal handlers
+        from apps.project import signals  # noqa: F401
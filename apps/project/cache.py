@@ -0,0 +1,219 @@
+import time
+from django.core.cache import cache
+from django.db import router
+from apps.project.models import Project, ProjectRole
+
+
+# Role maps only change through ProjectRole writes, which bump the version below,
+# so the timeout is only a safety net against leaked keys.
+PROJECT_ROLES_CACHE_TIMEOUT = 60 * 60
+
+# Rendered project payloads are versioned the same way
+PROJECT_PAYLOAD_CACHE_TIMEOUT = 60 * 60
+# How long a rebuild may hold the refill lock, and how long requests without any
+# payload to fall back on wait for it before building their own
+PROJECT_PAYLOAD_REFILL_TIMEOUT = 10
+PROJECT_PAYLOAD_REFILL_WAIT = 2
+
+# Ordered project lists are kept up to date as projects and memberships change, and checked
+# against the role map on every read, so the timeout only bounds ordering drift
+PROJECT_LIST_CACHE_TIMEOUT = 10 * 60
+
+
+def _roles_version_key(user_id):
+    return f'project_roles_version_{user_id}'
+
+
+def _project_version_key(project_id):
+    return f'project_version_{project_id}'
+
+
+def _get_version(key):
+    version = cache.get(key)
+
+    if version is None:
+        # Versions are timestamps rather than counters so that an evicted version key
+        # can never point back at stale data.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def get_roles_version(user_id):
+    """
+    Returns the current version of a user's role map, creating one if none exists yet.
+    """
+    return _get_version(_roles_version_key(user_id))
+
+
+def bump_roles_versions(user_ids):
+    """
+    Invalidates every cached role map of several users with a single cache write.
+    """
+    version = time.time_ns()
+    cache.set_many({_roles_version_key(user_id): version for user_id in user_ids}, timeout=None)
+
+
+def get_cached_project_roles(user_id):
+    """
+    Returns the user's {project_id: role} map from the cache, loading it from the database on a miss.
+    """
+    key = f'project_roles_{user_id}_v{get_roles_version(user_id)}'
+    roles = cache.get(key)
+
+    if roles is None:
+        # Always read from the primary, a lagging replica must never end up in the shared cache
+        roles = dict(
+            ProjectRole.objects.using(router.db_for_write(ProjectRole))
+            .filter(user_id=user_id).values_list('project_id', 'role')
+        )
+        cache.set(key, roles, timeout=PROJECT_ROLES_CACHE_TIMEOUT)
+
+    return roles
+
+
+def get_project_version(project_id):
+    """
+    Returns the current version of everything rendered about a project: its fields and
+    counters, members, roles and member profiles. Being a nanosecond timestamp, it doubles
+    as their last modification time.
+    """
+    return _get_version(_project_version_key(project_id))
+
+
+def bump_project_versions(project_ids):
+    """
+    Marks several projects as changed with a single cache write.
+    """
+    version = time.time_ns()
+    cache.set_many({_project_version_key(project_id): version for project_id in project_ids}, timeout=None)
+
+
+def _project_payload_key(project_id, variant=''):
+    return f'project_payload_{project_id}{variant}'
+
+
+def get_cached_project_payload(project_id, build, variant=''):
+    """
+    Returns (version, payload): the rendered payload of a project and the project version it
+    was rendered at, calling build() to render it again when the cached one is missing or
+    older than the project version. build() returns None for a project that doesn't exist,
+    which isn't cached. Payloads rendered differently (e.g. with
+    absolute URLs) are cached apart under their own `variant`.
+
+    Only one request at a time rebuilds a project's payload. Meanwhile, the others get the
+    previous payload (stale-while-revalidate) with its older version, or wait for the new one
+    if there is none yet.
+    """
+    version = get_project_version(project_id)
+    key = _project_payload_key(project_id, variant)
+    lock_key = f'{key}_refill'
+    deadline = time.monotonic() + PROJECT_PAYLOAD_REFILL_WAIT
+
+    while True:
+        cached = cache.get(key)
+        # Versions are compared as opaque tokens, hosts' clocks may disagree on their order
+        if cached is not None and cached[0] == version:
+            return cached
+
+        if cache.add(lock_key, True, timeout=PROJECT_PAYLOAD_REFILL_TIMEOUT):
+            try:
+                payload = build()
+                if payload is not None:
+                    # Stored under the version read before building, so a change made
+                    # while building still makes the next request rebuild
+                    cache.set(key, (version, payload), timeout=PROJECT_PAYLOAD_CACHE_TIMEOUT)
+                return version, payload
+            finally:
+                cache.delete(lock_key)
+
+        if cached is not None:
+            return cached
+
+        if time.monotonic() >= deadline:
+            # The rebuilding request is taking too long, don't hold this one up any further
+            return version, build()
+
+        time.sleep(0.05)
+
+
+def get_cached_project_payloads(project_ids, build_many, variant=''):
+    """
+    Multi-get version of get_cached_project_payload(). Returns {project_id: payload}, calling
+    build_many(project_ids) once for all the missing or outdated payloads.
+    """
+    if not project_ids:
+        return {}
+
+    version_keys = {project_id: _project_version_key(project_id) for project_id in project_ids}
+    found = cache.get_many(version_keys.values())
+    versions = {
+        project_id: found[key] if key in found else get_project_version(project_id)
+        for project_id, key in version_keys.items()
+    }
+
+    payload_keys = {project_id: _project_payload_key(project_id, variant) for project_id in project_ids}
+    cached = cache.get_many(payload_keys.values())
+
+    payloads = {}
+    for project_id, key in payload_keys.items():
+        entry = cached.get(key)
+        if entry is not None and entry[0] == versions[project_id]:
+            payloads[project_id] = entry[1]
+
+    missing = [project_id for project_id in project_ids if project_id not in payloads]
+    if missing:
+        built = build_many(missing)
+        cache.set_many(
+            {payload_keys[project_id]: (versions[project_id], payload) for project_id, payload in built.items()},
+            timeout=PROJECT_PAYLOAD_CACHE_TIMEOUT,
+        )
+        payloads.update(built)
+
+    return payloads
+
+
+def _project_list_key(user_id):
+    return f'project_list_{user_id}'
+
+
+def get_cached_project_list(user_id, project_ids):
+    """
+    Returns the ids of a user's projects, most recently updated first.
+
+    `project_ids` are the projects the user is a member of right now, from the role map.
+    A cached list that disagrees with them is reloaded with one query.
+    """
+    key = _project_list_key(user_id)
+    entries = cache.get(key)
+
+    if entries is None or {project_id for _, project_id in entries} != set(project_ids):
+        # Always read from the primary, a lagging replica must never end up in the shared cache
+        entries = list(
+            Project.objects.using(router.db_for_write(Project))
+            .filter(id__in=project_ids).order_by('-updated_at', '-id')
+            .values_list('updated_at', 'id')
+        )
+        cache.set(key, entries, timeout=PROJECT_LIST_CACHE_TIMEOUT)
+
+    return [project_id for _, project_id in entries]
+
+
+def update_cached_project_lists(user_ids, project_id, updated_at=None):
+    """
+    Moves a project to its place in the cached lists of the given users, or removes it from
+    them when `updated_at` is None. Lists that aren't cached are left to be loaded on next use.
+    """
+    keys = [_project_list_key(user_id) for user_id in user_ids]
+    lists = cache.get_many(keys)
+
+    for key, entries in lists.items():
+        entries = [entry for entry in entries if entry[1] != project_id]
+        if updated_at is not None:
+            entries.append((updated_at, project_id))
+            entries.sort(reverse=True)
+        lists[key] = entries
+
+    if lists:
+        cache.set_many(lists, timeout=PROJECT_LIST_CACHE_TIMEOUT)
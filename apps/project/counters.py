@@ -0,0 +1,80 @@
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from apps.project.models import Comment, Document, Project, ProjectRole
+from apps.project.signals import invalidate_projects
+
+
+def update_project_counters(project_id, touch=True, **deltas):
+    """
+    Applies counter deltas (e.g. comment_count=1, document_count=-2) to a project in a single
+    UPDATE using F() expressions, so concurrent writers never lose increments.
+    Call it inside the same transaction as the write it accounts for.
+    """
+    updates = {}
+
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        if delta > 0:
+            updates[field] = F(field) + delta
+        else:
+            # Never go below zero if the counter has drifted
+            updates[field] = Greatest(F(field) + delta, Value(0))
+
+    if touch:
+        updates['last_activity_at'] = timezone.now()
+
+    if updates:
+        Project.objects.filter(id=project_id).update(**updates)
+        # update() sends no signals, cached project payloads have to be told directly
+        invalidate_projects(project_id)
+
+
+def _count_subquery(queryset, project_field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{project_field: OuterRef('pk')})
+            .order_by()
+            .values(project_field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recompute_project_counters(queryset=None):
+    """
+    Recomputes every denormalized counter of the given projects (all by default) from
+    the source tables with one UPDATE. Returns the number of projects updated.
+    """
+    if queryset is None:
+        queryset = Project.objects.all()
+
+    latest_comment = (
+        Comment.objects.filter(project=OuterRef('pk'))
+        .order_by()
+        .values('project')
+        .annotate(latest=Max('created_at'))
+        .values('latest')
+    )
+
+    latest_comment = Subquery(latest_comment)
+
+    updated = queryset.update(
+        comment_count=_count_subquery(Comment.objects.all(), 'project'),
+        document_count=_count_subquery(Document.objects.all(), 'comment__project'),
+        member_count=_count_subquery(ProjectRole.objects.all(), 'project'),
+        # Other activity (documents, members, deleted comments) is only recorded in the field
+        # itself, so never move it back. Both sides are coalesced, SQLite's MAX() returns NULL
+        # as soon as one argument is NULL.
+        last_activity_at=Greatest(
+            Coalesce(F('last_activity_at'), latest_comment),
+            Coalesce(latest_comment, F('last_activity_at')),
+        ),
+    )
+    invalidate_projects(*queryset.values_list('id', flat=True))
+
+    return updated
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from apps.project.counters import recompute_project_counters
+from apps.project.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized comment, document and member counters of projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_ids', nargs='*', type=int, help="Only recompute these projects.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of projects updated per statement.")
+
+    def handle(self, *args, **options):
+        queryset = Project.objects.order_by('id')
+        if options['project_ids']:
+            queryset = queryset.filter(id__in=options['project_ids'])
+
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+
+        # Walk the table in id ranges so each UPDATE stays short on large tables
+        while True:
+            ids = list(queryset.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            total += recompute_project_counters(Project.objects.filter(id__in=ids))
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed counters for {total} project(s)."))
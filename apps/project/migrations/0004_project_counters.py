@@ -0,0 +1,68 @@
+# Generated by Django 5.0 on 2026-10-16 23:07
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def fill_project_counters(apps, schema_editor):
+    Project = apps.get_model('project', 'Project')
+    Comment = apps.get_model('project', 'Comment')
+    Document = apps.get_model('project', 'Document')
+    ProjectRole = apps.get_model('project', 'ProjectRole')
+
+    def count_of(model, project_field):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(**{project_field: OuterRef('pk')})
+                .order_by().values(project_field).annotate(total=Count('pk')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    latest_comment = Subquery(
+        Comment.objects.filter(project=OuterRef('pk'))
+        .order_by().values('project').annotate(latest=Max('created_at')).values('latest')
+    )
+
+    Project.objects.update(
+        comment_count=count_of(Comment, 'project'),
+        document_count=count_of(Document, 'comment__project'),
+        member_count=count_of(ProjectRole, 'project'),
+        last_activity_at=Greatest(
+            Coalesce(F('last_activity_at'), latest_comment),
+            Coalesce(latest_comment, F('last_activity_at')),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0003_alter_comment_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_project_counters, migrations.RunPython.noop),
+    ]
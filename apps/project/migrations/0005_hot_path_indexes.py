@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-16 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0004_project_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['project', '-created_at', '-id'], name='comment_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-updated_at', '-id'], name='project_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectrole',
+            index=models.Index(fields=['user', 'project', 'role'], name='projectrole_user_role_idx'),
+        ),
+    ]
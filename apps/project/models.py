@@ -14,6 +14,18 @@ class Project(models.Model):
     created_at  = models.DateTimeField(auto_now_add=True)
     updated_at  = models.DateTimeField(auto_now=True)
 
+    # Denormalized aggregates, kept up to date by apps.project.counters
+    comment_count    = models.PositiveIntegerField(default=0)
+    document_count   = models.PositiveIntegerField(default=0)
+    member_count     = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Project lists are ordered by most recently updated
+            models.Index(fields=['-updated_at', '-id'], name='project_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -30,6 +42,10 @@ class ProjectRole(models.Model):
     
     class Meta:
         unique_together = ['user', 'project']
+        indexes = [
+            # Covers role lookups so they never have to touch the table
+            models.Index(fields=['user', 'project', 'role'], name='projectrole_user_role_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.project.title} - {self.role}"
@@ -40,6 +56,12 @@ class Comment(models.Model):
     content    = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Comment feeds filter by project and show the newest first
+            models.Index(fields=['project', '-created_at', '-id'], name='comment_project_created_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.project.title}"
 
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save
+from apps.project.cache import (
+    bump_project_versions,
+    bump_roles_versions,
+    get_cached_project_roles,
+    update_cached_project_lists,
+)
+from apps.project.models import Project, ProjectRole
+from apps.user.models import User
+
+
+def invalidate_user_roles(*user_ids):
+    # Bump right away so the rest of this transaction sees the change, and again
+    # on commit so that a concurrent request can't re-cache the old roles in between.
+    # Bulk role writes don't send signals and call this directly.
+    bump_roles_versions(user_ids)
+    transaction.on_commit(lambda: bump_roles_versions(user_ids))
+
+
+def invalidate_projects(*project_ids):
+    # Same as above, for the validators of project responses
+    bump_project_versions(project_ids)
+    transaction.on_commit(lambda: bump_project_versions(project_ids))
+
+
+def move_in_project_lists(user_ids, project_id, updated_at=None):
+    # Cached project lists are only edited once the change is committed.
+    # Members' lists are checked against their role maps anyway, see get_cached_project_list().
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: update_cached_project_lists(user_ids, project_id, updated_at))
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_projects(instance.pk)
+        # updated_at moved, and with it the project's place in every member's list
+        member_ids = ProjectRole.objects.filter(project_id=instance.pk).values_list('user_id', flat=True)
+        move_in_project_lists(member_ids, instance.pk, instance.updated_at)
+
+
+@receiver(post_save, sender=ProjectRole)
+def project_role_saved(sender, instance, created, **kwargs):
+    invalidate_user_roles(instance.user_id)
+    invalidate_projects(instance.project_id)
+    if created:
+        move_in_project_lists([instance.user_id], instance.project_id, instance.project.updated_at)
+
+
+# Also fires for every role removed when a project (or user) is deleted, since deletes cascade.
+@receiver(post_delete, sender=ProjectRole)
+def project_role_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(instance.user_id)
+    invalidate_projects(instance.project_id)
+    move_in_project_lists([instance.user_id], instance.project_id)
+
+
+# Member profiles are part of project and comment responses
+@receiver(post_save, sender=User)
+def member_saved(sender, instance, created, **kwargs):
+    if not created:
+        project_ids = list(get_cached_project_roles(instance.pk))
+        if project_ids:
+            invalidate_projects(*project_ids)
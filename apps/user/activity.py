@@ -0,0 +1,143 @@
+import time
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from apps.user.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginTracker:
+    """
+    Coalesces last_login writes.
+
+    Every login or token refresh queues the user with their latest timestamp, in memory.
+    Queued users are written together with a single UPDATE every LAST_LOGIN_FLUSH_INTERVAL
+    seconds by a background thread per process (or inline by the next login when
+    LAST_LOGIN_BACKGROUND_FLUSH is off).
+
+    A user is written at most once per LAST_LOGIN_UPDATE_INTERVAL across all workers. Users
+    written recently stay queued until their interval is over, so the last login of every
+    interval still reaches the database. Users whose write fails stay queued as well, and
+    the write never moves last_login backwards, whichever worker flushes first.
+    """
+
+    def __init__(self):
+        self._pending = {}  # user_id -> latest login timestamp
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+
+    @property
+    def update_interval(self):
+        return getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 300)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL', 10)
+
+    @property
+    def background(self):
+        return getattr(settings, 'LAST_LOGIN_BACKGROUND_FLUSH', True)
+
+    def _throttle_key(self, user_id):
+        return f'last_login_throttle_{user_id}'
+
+    def record(self, user_id, when=None):
+        when = when or timezone.now()
+        with self._lock:
+            self._pending[user_id] = max(self._pending.get(user_id, when), when)
+
+        if self.background:
+            self.start()
+        elif time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def start(self):
+        """
+        Starts the flushing thread of this process, unless it is already running. Threads
+        don't survive a fork, so each worker starts its own on its first login.
+        """
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name='last-login-flusher', daemon=True)
+            self._flusher.start()
+
+        atexit.unregister(self._flush_on_exit)
+        atexit.register(self._flush_on_exit)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush pending last_login updates")
+            finally:
+                # The thread outlives requests, so nothing else recycles its connection
+                close_old_connections()
+
+    def _flush_on_exit(self):
+        # Best effort, so that a worker shutting down doesn't drop its queued writes
+        try:
+            self.flush()
+            close_old_connections()
+        except Exception:
+            logger.exception("Could not flush pending last_login updates")
+
+    def flush(self):
+        """
+        Writes the latest timestamps of the queued users that weren't written within the last
+        LAST_LOGIN_UPDATE_INTERVAL. Returns the number of users updated.
+        """
+        with self._lock:
+            user_ids = list(self._pending)
+            self._last_flush = time.monotonic()
+
+        if not user_ids:
+            return 0
+
+        keys = {user_id: self._throttle_key(user_id) for user_id in user_ids}
+        throttled = cache.get_many(keys.values())
+        due = [
+            user_id for user_id, key in keys.items()
+            if key not in throttled and cache.add(key, True, timeout=self.update_interval)
+        ]
+        if not due:
+            return 0
+
+        with self._lock:
+            # Includes logins recorded since the queue was read
+            logins = {user_id: self._pending.pop(user_id) for user_id in due}
+
+        try:
+            login = Case(
+                *(When(id=user_id, then=Value(when)) for user_id, when in logins.items()),
+                output_field=DateTimeField(),
+            )
+            User.objects.filter(id__in=logins).update(
+                last_login=Greatest(Coalesce(F('last_login'), login), login)
+            )
+        except Exception:
+            # Retried by the next flush
+            cache.delete_many([keys[user_id] for user_id in logins])
+            with self._lock:
+                for user_id, when in logins.items():
+                    self._pending[user_id] = max(self._pending.get(user_id, when), when)
+            raise
+
+        return len(logins)
+
+
+last_login_tracker = LastLoginTracker()
+
+
+def record_login(user_id):
+    last_login_tracker.record(user_id)
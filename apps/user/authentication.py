@@ -0,0 +1,60 @@
+from django.db import router
+from django.db.models import DEFERRED
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from apps.user.blacklist import is_blacklisted
+
+
+# User fields copied into every access token, enough for most views to never load the user row
+TOKEN_USER_CLAIMS = ('username', 'email', 'email_verified', 'is_active')
+
+
+def add_user_claims(token, user):
+    for claim in TOKEN_USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the user from the access token's claims instead of
+    loading it from the database on every request, and rejects blacklisted or revoked tokens.
+
+    The user is a regular User instance with every other field deferred, so a view that
+    touches one of them loads it on access. Deactivating a user or changing one of the
+    claimed fields revokes their access tokens (see apps.user.signals), and refreshing
+    reads the claims from the database again, so claims are never stale for long.
+    """
+
+    def get_validated_token(self, raw_token):
+        # Checked here rather than per header prefix, so every AUTH_HEADER_TYPES is covered
+        validated_token = super().get_validated_token(raw_token)
+        if is_blacklisted(validated_token.payload):
+            raise AuthenticationFailed(_("Token has been blacklisted"), code="token_blacklisted")
+        return validated_token
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in TOKEN_USER_CLAIMS):
+            # Tokens issued before the claims were added
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        values = {api_settings.USER_ID_FIELD: user_id}
+        values.update((claim, validated_token[claim]) for claim in TOKEN_USER_CLAIMS)
+
+        # from_db() expects the values in the model's field order, with DEFERRED for the rest
+        fields = self.user_model._meta.concrete_fields
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model),
+            [field.attname for field in fields if field.attname in values],
+            [values.get(field.attname, DEFERRED) for field in fields],
+        )
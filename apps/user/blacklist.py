@@ -0,0 +1,170 @@
+import time
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class RecentlyCheckedTokens:
+    """
+    Bounded, thread-safe LRU of token ids this process recently found not blacklisted.
+
+    Entries expire after `ttl` seconds, which bounds how long a token blacklisted by another
+    worker can still be accepted here. Blacklisting through this process drops the entry right away.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        with self._lock:
+            expires_at = self._entries.get(jti)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[jti]
+                return False
+            self._entries.move_to_end(jti)
+            return True
+
+    def add(self, jti):
+        with self._lock:
+            self._entries[jti] = time.monotonic() + self.ttl
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, jti):
+        with self._lock:
+            self._entries.pop(jti, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+recently_checked = RecentlyCheckedTokens(
+    max_size=getattr(settings, 'TOKEN_BLACKLIST_LOCAL_SIZE', 10000),
+    ttl=getattr(settings, 'TOKEN_BLACKLIST_LOCAL_TTL', 5),
+)
+
+
+def _jti_key(jti):
+    return f'blacklisted_jti_{jti}'
+
+
+def _watermark_key(user_id):
+    return f'tokens_revoked_before_{user_id}'
+
+
+def is_blacklisted(payload):
+    """
+    Checks a decoded access token against the jti blacklist and its user's revocation watermark.
+    Tokens recently found clean by this process are answered without a cache round-trip.
+    """
+    jti = payload.get(api_settings.JTI_CLAIM)
+    if jti in recently_checked:
+        return False
+
+    jti_key = _jti_key(jti)
+    watermark_key = _watermark_key(payload.get(api_settings.USER_ID_CLAIM))
+    values = cache.get_many([jti_key, watermark_key])
+
+    watermark = values.get(watermark_key)
+    blacklisted = jti_key in values or (watermark is not None and payload.get('iat', 0) < watermark)
+
+    if not blacklisted:
+        recently_checked.add(jti)
+
+    return blacklisted
+
+
+def blacklist_token(payload):
+    """
+    Blacklists a single access token until it expires.
+    """
+    remaining_time = int(payload['exp'] - time.time())
+    jti = payload[api_settings.JTI_CLAIM]
+
+    if remaining_time > 0:
+        cache.set(_jti_key(jti), True, timeout=remaining_time)
+
+    recently_checked.discard(jti)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Rejects every access token issued to the user before now (logout-all).
+    The watermark only has to outlive the longest-lived access token.
+    """
+    lifetime = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    # `iat` has a one second resolution. Tokens issued within the same second as the
+    # revocation are kept, so that logging straight back in always works.
+    cache.set(_watermark_key(user_id), int(time.time()), timeout=lifetime)
+
+    # Entries aren't indexed by user, and revocations are rare
+    recently_checked.clear()
+
+
+def blacklist_refresh_tokens(user_id):
+    """
+    Blacklists every unexpired refresh token of the user that isn't blacklisted yet, with
+    a single INSERT ... SELECT so the tokens never have to be loaded into Python.
+    Returns the number of tokens blacklisted.
+    """
+    connection = connections[router.db_for_write(BlacklistedToken)]
+    quote = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    # A concurrent logout may blacklist the same tokens, skip those instead of failing
+    if connection.vendor == 'mysql':
+        insert, on_conflict = 'INSERT IGNORE INTO', ''
+    else:
+        insert, on_conflict = 'INSERT INTO', 'ON CONFLICT (token_id) DO NOTHING'
+
+    sql = f"""
+        {insert} {quote(BlacklistedToken._meta.db_table)} (token_id, blacklisted_at)
+        SELECT outstanding.id, %s
+        FROM {quote(OutstandingToken._meta.db_table)} outstanding
+        WHERE outstanding.user_id = %s
+          AND outstanding.expires_at > %s
+          AND NOT EXISTS (
+              SELECT 1 FROM {quote(BlacklistedToken._meta.db_table)} blacklisted
+              WHERE blacklisted.token_id = outstanding.id
+          )
+        {on_conflict}
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [now, user_id, now])
+        return cursor.rowcount
+
+
+def purge_expired_tokens(batch_size=1000):
+    """
+    Deletes expired outstanding refresh tokens and their blacklist entries, batch_size at a time
+    so each transaction stays short. An expired token is rejected on its own, so neither row is
+    needed anymore. Returns the number of outstanding tokens deleted.
+    """
+    queryset = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).order_by('id')
+    total = 0
+
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+
+        total += len(ids)
+
+    return total
@@ -27,7 +27,7 @@ class User(AbstractUser):
     photo           = models.ImageField(_('Profile'), upload_to=user_img_upload_location, default=None, blank=True, null=True)
     contact_number  = PhoneNumberField(_('Phone Number'), blank=True, null=True, max_length=15)
     bio             = models.TextField(_("Bio"), null=True, blank=True)
-    last_login      = models.DateTimeField(_('Last Login'), auto_now=True)
+    last_login      = models.DateTimeField(_('Last Login'), null=True, blank=True)
     date_joined     = models.DateTimeField(_('Date Joined'), auto_now_add=True)
 
     objects         = CustomUserManager()
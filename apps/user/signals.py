@@ -0,0 +1,39 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, pre_save
+from apps.user.authentication import TOKEN_USER_CLAIMS
+from apps.user.blacklist import blacklist_refresh_tokens, revoke_user_tokens
+from apps.user.models import User
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Remember whether a field copied into the tokens is about to change
+    instance._token_claims_changed = False
+    if instance._state.adding or instance.pk is None:
+        return
+
+    claims = [
+        claim for claim in TOKEN_USER_CLAIMS
+        if claim not in instance.get_deferred_fields() and (update_fields is None or claim in update_fields)
+    ]
+    if not claims:
+        return
+
+    stored = sender._base_manager.filter(pk=instance.pk).values(*claims).first()
+    instance._token_claims_changed = stored is not None and any(
+        stored[claim] != getattr(instance, claim) for claim in claims
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    # Tokens carry is_active as a claim, so deactivating a user has to revoke them
+    if not instance.is_active:
+        revoke_user_tokens(instance.pk)
+        blacklist_refresh_tokens(instance.pk)
+    elif getattr(instance, '_token_claims_changed', False):
+        # The next refresh issues an access token with the new claims
+        revoke_user_tokens(instance.pk)
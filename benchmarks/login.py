@@ -0,0 +1,87 @@
+"""
+Login throughput benchmark.
+
+Runs logins against the real login endpoint on a throwaway test database, in one
+process per core, and reports logins/sec per core along with the number of password
+hash checks each login costs.
+
+    $ python benchmarks/login.py --logins 50 --processes 2
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PASSWORD = 'StrongPassword123'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pma.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    os.environ['DB_ENGINE'] = 'sqlite3'
+
+    import django
+    django.setup()
+
+
+def run_logins(logins, results):
+    setup_django()
+
+    from unittest.mock import patch
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+    from apps.user.models import User
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+    user = User.objects.create_user(username='bench', email='bench@example.com', password=PASSWORD, is_active=True)
+    client = APIClient()
+    payload = {'email': user.email, 'password': PASSWORD}
+
+    with patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as check_password:
+        started = time.perf_counter()
+        for _ in range(logins):
+            response = client.post('/api/v1/auth/login/', payload)
+            assert response.status_code == 200, response.content
+        elapsed = time.perf_counter() - started
+
+    results.put((logins / elapsed, check_password.call_count / logins))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=50, help="Logins per process.")
+    parser.add_argument('--processes', type=int, default=1, help="Number of processes, one per core.")
+    args = parser.parse_args()
+
+    # Django opens the configured database before switching to the test one, point it at a
+    # throwaway file so nothing is left in the repository
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['SQLITE_PATH'] = os.path.join(directory, 'db.sqlite3')
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=run_logins, args=(args.logins, results))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    per_core = sum(t[0] for t in totals) / len(totals)
+    hashes = totals[0][1]
+    print(f"{'processes':>9} {'logins/sec/core':>16} {'total logins/sec':>17} {'hashes/login':>13}")
+    print(f"{args.processes:>9} {per_core:>16.1f} {per_core * len(totals):>17.1f} {hashes:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Response rendering benchmark.
+
+Renders comment list pages, shaped like the ones CommentListAPIView returns, through
+CustomResponseRenderer with DRF's stdlib json encoder and with orjson, and reports
+pages rendered per second for each.
+
+    $ python benchmarks/renderers.py --comments 50 --pages 2000
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pma.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+
+    import django
+    django.setup()
+
+
+def comment_page(comments):
+    return {
+        'current_page': 1,
+        'total_pages': 40,
+        'total_records': comments * 40,
+        'next': 'http://localhost:8000/api/v1/projects/1/comments/?page=2',
+        'previous': None,
+        'comments': [
+            {
+                'id': i,
+                'project': 1,
+                'user': {'username': f'user{i % 7}', 'photo': f'http://localhost:8000/media/users/{i % 7}.png'},
+                'content': f'Comment {i} ' + 'lorem ipsum dolor sit amet ' * 12,
+                'created_at': '2025-01-02T03:04:05.678Z',
+                'documents': [
+                    {'id': i * 3 + n, 'file': f'http://localhost:8000/media/comment_documents/{i}-{n}.pdf'}
+                    for n in range(3)
+                ],
+            }
+            for i in range(comments)
+        ],
+    }
+
+
+def run(label, pages, data):
+    from django.http import HttpResponse
+    from api.utils.renderers import CustomResponseRenderer
+
+    renderer = CustomResponseRenderer()
+    context = {'response': HttpResponse(status=200)}
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        size = len(renderer.render(data, 'application/json', context))
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<8} {size:>10} {pages / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments', type=int, default=50, help="Comments per page.")
+    parser.add_argument('--pages', type=int, default=2000, help="Pages rendered per encoder.")
+    args = parser.parse_args()
+
+    setup_django()
+    from api.utils import renderers
+
+    if renderers.orjson is None:
+        sys.exit("orjson isn't installed, there is nothing to compare.")
+
+    data = comment_page(args.comments)
+    orjson = renderers.orjson
+
+    print(f"{'encoder':<8} {'bytes':>10} {'pages/sec':>12}")
+    renderers.orjson = None
+    run('stdlib', args.pages, data)
+    renderers.orjson = orjson
+    run('orjson', args.pages, data)
+
+
+if __name__ == '__main__':
+    main()
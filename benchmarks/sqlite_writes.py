@@ -0,0 +1,123 @@
+"""
+Concurrent comment-write benchmark for SQLite.
+
+Simulates several gunicorn workers creating comments at the same time through the real
+comment endpoint (permission check, comment insert and project counter update), against
+a stock SQLite database and one using the SQLITE_TUNING settings, and reports write
+throughput and "database is locked" failures for each.
+
+    $ python benchmarks/sqlite_writes.py --workers 4 --writes 500
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pma.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    os.environ['DB_ENGINE'] = 'sqlite3'
+    os.environ['CACHE_BACKEND'] = 'locmem'
+    os.environ['LAST_LOGIN_BACKGROUND_FLUSH'] = '0'
+
+    import django
+    django.setup()
+
+
+def create_database(workers, results):
+    setup_django()
+
+    from django.core.management import call_command
+    from apps.project.models import Project, ProjectRole
+    from apps.user.models import User
+
+    call_command('migrate', verbosity=0)
+
+    owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+    project = Project.objects.create(title='Benchmark', description='Concurrent writes')
+    ProjectRole.objects.create(user=owner, project=project, role='OWNER')
+    for user_id in range(1, workers + 1):
+        user = User.objects.create_user(username=f'editor{user_id}', email=f'editor{user_id}@example.com', password='x')
+        ProjectRole.objects.create(user=user, project=project, role='EDITOR')
+
+    results.put(project.id)
+
+
+def worker(user_id, project_id, writes, results):
+    setup_django()
+
+    from django.db import OperationalError
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from apps.user.models import User
+
+    setup_test_environment()
+    client = APIClient()
+    client.force_authenticate(user=User.objects.get(username=f'editor{user_id}'))
+    url = reverse('comment-create')
+    done = locked = 0
+
+    for i in range(writes):
+        try:
+            response = client.post(url, {'project': project_id, 'content': f'Comment {i} from worker {user_id}'})
+            assert response.status_code == 201, response.content
+            done += 1
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            locked += 1
+
+    results.put((done, locked))
+
+
+def run(label, tuning, workers, writes):
+    # Settings are read from the environment by each process, which inherits it
+    os.environ['SQLITE_TUNING'] = str(int(tuning))
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['SQLITE_PATH'] = os.path.join(directory, 'bench.sqlite3')
+
+        results = multiprocessing.Queue()
+        setup = multiprocessing.Process(target=create_database, args=(workers, results))
+        setup.start()
+        project_id = results.get()
+        setup.join()
+
+        processes = [
+            multiprocessing.Process(target=worker, args=(user_id, project_id, writes, results))
+            for user_id in range(1, workers + 1)
+        ]
+
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    done = sum(t[0] for t in totals)
+    locked = sum(t[1] for t in totals)
+    print(f"{label:<8} {workers:>7} {done:>9} {locked:>8} {done / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help="Number of concurrent worker processes.")
+    parser.add_argument('--writes', type=int, default=500, help="Comments written by each worker.")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'workers':>7} {'committed':>9} {'locked':>8} {'writes/sec':>12}")
+    run('stock', False, args.workers, args.writes)
+    run('tuned', True, args.workers, args.writes)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,26 @@
 import uuid
 import pytest
 from apps.user.models import User
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from apps.project.models import Comment, Project, ProjectRole
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached data is keyed by ids that get reused between tests, so start every test with an empty cache."""
+    cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Keep uploaded test documents out of the project's media folder."""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -0,0 +1,240 @@
+import time
+import pickle
+import threading
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Changed by every overwrite of a broadcast key, so other processes know their L1 may be stale
+EPOCH_KEY = 'tiered_cache_epoch'
+
+_MISSING = object()
+
+
+class _LocalTier:
+    """
+    L1 state shared by every thread of a process. Django creates cache objects per thread,
+    so it can't live on the TieredCache instance.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, pickled value)
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.polled_at = float('-inf')
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    Bounded in-process L1 in front of a shared cache (Redis, database or files).
+
+    Only keys starting with one of L1_KEY_PREFIXES are held in L1, which should be the hot,
+    read-mostly ones (role versions and role maps). Every other key goes straight to the
+    shared cache, and writing it costs nothing extra.
+
+    L1 keys are answered from L1 for at most L1_TIMEOUT seconds, and writes to them go through
+    to the shared cache. Keys overwritten in place (role versions), the ones starting with one
+    of BROADCAST_KEY_PREFIXES, also broadcast an invalidation by changing a shared epoch key
+    whenever they are set, incremented or deleted. Every process checks the epoch at most once
+    per EPOCH_POLL_INTERVAL seconds, when it reads an L1 key, and drops its L1 when the epoch
+    has moved, so such a write reaches every worker within that interval.
+
+    Other L1 keys are expected to be written once per value, e.g. under a versioned name, so
+    writing them only updates the local L1. So does `add()`, which only succeeds for a missing
+    key: other processes can at most hold a copy from before it expired or was evicted, and
+    drop it within L1_TIMEOUT seconds.
+
+    OPTIONS:
+      - `SHARED`: alias of the shared cache in CACHES.
+      - `L1_KEY_PREFIXES`: prefixes of the keys kept in L1.
+      - `BROADCAST_KEY_PREFIXES`: prefixes of the L1 keys whose writes are broadcast, all of
+        them by default.
+      - `L1_MAX_ENTRIES`: entries kept per process, least recently used go first.
+      - `L1_TIMEOUT`: seconds an entry is served from L1.
+      - `EPOCH_POLL_INTERVAL`: seconds between epoch checks.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.l1_key_prefixes = tuple(options.get('L1_KEY_PREFIXES', ()))
+        self.broadcast_key_prefixes = tuple(options.get('BROADCAST_KEY_PREFIXES', self.l1_key_prefixes))
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self.poll_interval = float(options.get('EPOCH_POLL_INTERVAL', 1))
+
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(location, _LocalTier())
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    # L1
+
+    def _is_local(self, key):
+        return key.startswith(self.l1_key_prefixes)
+
+    def _is_broadcast(self, key):
+        return self._is_local(key) and key.startswith(self.broadcast_key_prefixes)
+
+    def _local_key(self, key, version):
+        return key, self.version if version is None else version
+
+    def _sync(self):
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.polled_at < self.poll_interval:
+            return
+
+        epoch = self.shared.get(EPOCH_KEY)
+        with tier.lock:
+            tier.polled_at = now
+            if epoch != tier.epoch:
+                tier.entries.clear()
+                tier.epoch = epoch
+
+    def _local_get(self, local_key):
+        tier = self._tier
+        with tier.lock:
+            entry = tier.entries.get(local_key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del tier.entries[local_key]
+                return _MISSING
+            tier.entries.move_to_end(local_key)
+            pickled = entry[1]
+
+        # Every caller gets its own copy, as with the shared backends
+        return pickle.loads(pickled)
+
+    def _local_set(self, local_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        ttl = self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+
+        tier = self._tier
+        with tier.lock:
+            if ttl <= 0:
+                tier.entries.pop(local_key, None)
+                return
+            tier.entries[local_key] = (time.monotonic() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            tier.entries.move_to_end(local_key)
+            while len(tier.entries) > self.l1_max_entries:
+                tier.entries.popitem(last=False)
+
+    def _local_delete(self, *local_keys):
+        with self._tier.lock:
+            for local_key in local_keys:
+                self._tier.entries.pop(local_key, None)
+
+    def _broadcast(self, keys, version):
+        # Drops the local copies of the given keys, and those of other processes if needed
+        self._local_delete(*(self._local_key(key, version) for key in keys if self._is_local(key)))
+        if any(self._is_broadcast(key) for key in keys):
+            self.shared.set(EPOCH_KEY, time.time_ns(), timeout=None)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self.shared.get(key, default, version=version)
+
+        self._sync()
+        local_key = self._local_key(key, version)
+
+        value = self._local_get(local_key)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self._local_set(local_key, value, DEFAULT_TIMEOUT)
+
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = {}
+        missing = []
+
+        if any(self._is_local(key) for key in keys):
+            self._sync()
+
+        for key in keys:
+            value = self._local_get(self._local_key(key, version)) if self._is_local(key) else _MISSING
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing:
+            for key, value in self.shared.get_many(missing, version=version).items():
+                if self._is_local(key):
+                    self._local_set(self._local_key(key, version), value, DEFAULT_TIMEOUT)
+                found[key] = value
+
+        return found
+
+    def has_key(self, key, version=None):
+        if self._is_local(key):
+            self._sync()
+            if self._local_get(self._local_key(key, version)) is not _MISSING:
+                return True
+        return self.shared.has_key(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added and self._is_local(key):
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        if self._is_local(key):
+            self._broadcast([key], version)
+            self._local_set(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+
+        local_data = {key: value for key, value in data.items() if self._is_local(key)}
+        if local_data:
+            self._broadcast(local_data, version)
+            for key, value in local_data.items():
+                if key not in failed:
+                    self._local_set(self._local_key(key, version), value, timeout)
+
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._broadcast([key], version)
+        return value
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        self._broadcast([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        self._broadcast(keys, version)
+
+    def clear(self):
+        self.shared.clear()
+        with self._tier.lock:
+            self._tier.entries.clear()
+        self.shared.set(EPOCH_KEY, time.time_ns(), timeout=None)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for single-node deployments.
+
+    Supports two extra OPTIONS on top of the stock backend:
+      - `pragmas`: PRAGMAs run on every new connection, e.g. {'journal_mode': 'WAL'}.
+      - `transaction_mode`: set to 'IMMEDIATE' so transactions take the write lock up front
+        and wait on busy_timeout, instead of failing with "database is locked" when a read
+        transaction later tries to write.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
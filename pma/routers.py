@@ -0,0 +1,111 @@
+import random
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Set for the duration of a request that may read from a replica
+_use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Sends every read inside the block to the default database, e.g. to build data that
+    ends up in a shared cache, where a lagging replica's copy must never be stored.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to one of settings.DATABASE_REPLICAS while ReplicaRoutingMiddleware allows it
+    for the current request. Writes, and reads everywhere else, go to the default database,
+    except for reads of related objects, which follow the instance they're read from.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Related objects and prefetches are read from the same database as their parent
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+
+        if replicas and _use_replica.get():
+            return random.choice(replicas)
+
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the default database
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests to views with `use_read_replica = True` read from a replica.
+
+    A client that has just written is pinned to the default database for
+    settings.REPLICA_PIN_SECONDS, so it always reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', []):
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.set(False)
+
+        client_key = self.get_client_key(request)
+        if request.method not in SAFE_METHODS and client_key:
+            cache.set(self.get_pin_key(client_key), True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not getattr(settings, 'DATABASE_REPLICAS', []) or request.method not in SAFE_METHODS:
+            return None
+
+        # DRF and Django class based views expose their class on the view function
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'use_read_replica', False):
+            return None
+
+        client_key = self.get_client_key(request)
+        if client_key and cache.get(self.get_pin_key(client_key)):
+            return None
+
+        _use_replica.set(True)
+        return None
+
+    def get_client_key(self, request):
+        """
+        Identifies the client without touching the database: the bearer token if there is
+        one, otherwise the session.
+        """
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header:
+            return hashlib.sha256(auth_header.encode()).hexdigest()
+
+        return request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+    def get_pin_key(self, client_key):
+        return f'replica_pin_{client_key}'
@@ -14,6 +14,7 @@ from datetime import timedelta
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -79,7 +80,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'apps.user.middleware.TokenBlacklistMiddleware',
+    'pma.routers.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'pma.urls'
@@ -109,13 +110,129 @@ AUTH_USER_MODEL = 'user.User'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'pma'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Keep connections open between requests and check them before reuse
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': bool(int(os.getenv('DB_CONN_HEALTH_CHECKS', 1))),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+    # Opt-in tuning for single-node deployments that take concurrent writes on SQLite
+    if bool(int(os.getenv('SQLITE_TUNING', 0))):
+        DATABASES['default'].update({
+            'ENGINE': 'pma.backends.sqlite3',
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', 20000)),  # Negative values are in KiB
+                    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+                    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+                    'temp_store': 'MEMORY',
+                },
+            },
+        })
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {DB_ENGINE!r}, expected 'postgresql' or 'sqlite3'")
+
+
+# Read replicas, as comma separated hosts (PostgreSQL) or file paths (SQLite) of copies of the
+# default database. Safe requests to list/detail endpoints read from them, except for clients
+# that wrote within the last DB_REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+
+for index, location in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    replica = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
     }
+    if DB_ENGINE == 'postgresql':
+        replica['HOST'] = location.strip()
+    else:
+        replica['NAME'] = location.strip()
+
+    DATABASES[f'replica_{index}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['pma.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+
+# Caches
+#
+# LocMem is private to each worker process, so token blacklists and cached role maps written by
+# one worker are invisible to the others. Multi-worker deployments should set CACHE_BACKEND to a
+# shared backend: 'redis', 'database' (run `manage.py createcachetable` first) or 'file'.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+SHARED_CACHE_BACKENDS = {
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'pma_cache'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', '/var/tmp/pma_cache'),
 }
 
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+elif CACHE_BACKEND in SHARED_CACHE_BACKENDS:
+    backend, location = SHARED_CACHE_BACKENDS[CACHE_BACKEND]
+    shared_cache = {
+        'BACKEND': backend,
+        'LOCATION': os.getenv('CACHE_LOCATION', location),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'pma'),
+    }
+
+    # Hot, read-mostly keys (role versions and role maps) are also kept in a small per-process L1.
+    # Role maps are versioned, so only bumping a role version invalidates the L1 of every worker,
+    # within CACHE_L1_POLL_INTERVAL seconds.
+    if bool(int(os.getenv('CACHE_L1', 1))):
+        CACHES = {
+            'default': {
+                'BACKEND': 'pma.backends.cache.TieredCache',
+                'LOCATION': 'default',
+                'OPTIONS': {
+                    'SHARED': 'shared',
+                    'L1_KEY_PREFIXES': tuple(filter(None, os.getenv('CACHE_L1_KEY_PREFIXES', 'project_roles_').split(','))),
+                    'BROADCAST_KEY_PREFIXES': tuple(filter(None, os.getenv('CACHE_L1_BROADCAST_KEY_PREFIXES', 'project_roles_version_').split(','))),
+                    'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', 1000)),
+                    'L1_TIMEOUT': float(os.getenv('CACHE_L1_TIMEOUT', 5)),
+                    'EPOCH_POLL_INTERVAL': float(os.getenv('CACHE_L1_POLL_INTERVAL', 1)),
+                },
+            },
+            'shared': shared_cache,
+        }
+    else:
+        CACHES = {'default': shared_cache}
+else:
+    raise ImproperlyConfigured(
+        f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}, expected 'locmem', {', '.join(map(repr, SHARED_CACHE_BACKENDS))}"
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -140,7 +257,7 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': ('api.utils.renderers.CustomResponseRenderer',),
     'EXCEPTION_HANDLER': 'api.utils.validation.custom_exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.user.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
@@ -182,6 +299,18 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Access tokens this process recently found not blacklisted are trusted for this many seconds
+# without asking the cache, so a logout in another worker takes up to this long to apply there.
+TOKEN_BLACKLIST_LOCAL_TTL = int(os.getenv('TOKEN_BLACKLIST_LOCAL_TTL', 5))
+TOKEN_BLACKLIST_LOCAL_SIZE = int(os.getenv('TOKEN_BLACKLIST_LOCAL_SIZE', 10000))
+
+# last_login is written at most once per user every LAST_LOGIN_UPDATE_INTERVAL seconds,
+# in batches flushed by a background thread in each process every LAST_LOGIN_FLUSH_INTERVAL seconds.
+# With LAST_LOGIN_BACKGROUND_FLUSH off, the next login flushes them instead.
+LAST_LOGIN_UPDATE_INTERVAL = int(os.getenv('LAST_LOGIN_UPDATE_INTERVAL', 300))
+LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 10))
+LAST_LOGIN_BACKGROUND_FLUSH = bool(int(os.getenv('LAST_LOGIN_BACKGROUND_FLUSH', 1)))
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {'type': 'apiKey', 'name': 'Authorization', 'in': 'header'},
@@ -323,6 +452,12 @@ else:
     MEDIA_URL = '/media/'
     MEDIA_ROOT = BASE_DIR / 'media'
 
+# How local document downloads are sent once the API has checked permissions: by Django
+# (''), or handed to the web server with 'x-accel-redirect' (nginx) or 'x-sendfile'.
+DOCUMENT_DOWNLOAD_BACKEND = os.getenv('DOCUMENT_DOWNLOAD_BACKEND', '')
+# nginx `internal` location that serves MEDIA_ROOT, for 'x-accel-redirect'
+DOCUMENT_ACCEL_REDIRECT_PREFIX = os.getenv('DOCUMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,32 @@
+"""
+Settings for the test suite, selected in pytest.ini.
+
+Tests always run against SQLite and LocMem, whatever the environment says.
+"""
+
+from pma.settings import *  # noqa: F401,F403
+from pma.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # An independent second database, for tests that check where reads are routed.
+    # Tests opt in by listing it in DATABASE_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+DATABASE_REPLICAS = []
+
+CACHE_BACKEND = 'locmem'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# The flushing thread's connection can't see the test transaction, so the next login flushes instead
+LAST_LOGIN_BACKGROUND_FLUSH = False